@@ -0,0 +1,40 @@
+#!/bin/bash
+# Client for hook-dispatcher.py. The hooks/*.sh shims keep only their hook's
+# description, the handler they run ("# Handler:" line) and any shell fast
+# path; the checks themselves live in hook_handlers.py, run by the resident
+# dispatcher. A shim execs this with its handler name; this forwards the
+# hook's stdin, PPID, CLAUDE_SESSION_ID and cwd to the dispatcher in one nc
+# round-trip, replays the handler's stdout/stderr and exits with its code, so
+# allow (0) and block (2) work as before.
+#
+# No nc, no dispatcher, or no answer: exec hook-dispatcher.py --run, which
+# runs the handler itself and starts a dispatcher for the next call.
+#
+# Usage: exec hook-client.sh <handler-name>   (hook stdin on stdin)
+
+NAME="$1"
+if [[ "${BASH_SOURCE[0]}" == */* ]]; then HOOKS_DIR="${BASH_SOURCE[0]%/*}"; else HOOKS_DIR=.; fi
+
+# Byte lengths, and no multibyte surprises in the reply loop
+LC_ALL=C
+IFS= read -r -d '' INPUT
+
+SOCK="${TMPDIR:-/tmp}"
+SOCK="${SOCK%/}/claude-hooks-${UID}.sock"
+
+if [[ -S "$SOCK" ]] && command -v nc >/dev/null 2>&1; then
+  REPLY_TEXT="$(printf '%s\t%s\t%s\t%s\t%s\n%s' "$NAME" "$PPID" "${CLAUDE_SESSION_ID:-}" "${#INPUT}" "$PWD" "$INPUT" \
+    | nc -U "$SOCK" 2>/dev/null)"
+  CODE="${REPLY_TEXT%%$'\n'*}"
+  if [[ "$CODE" =~ ^[0-9]+$ ]]; then
+    while IFS= read -r line; do
+      case "$line" in
+        "1 "*) printf '%s\n' "${line:2}" ;;
+        "2 "*) printf '%s\n' "${line:2}" >&2 ;;
+      esac
+    done <<< "${REPLY_TEXT#*$'\n'}"
+    exit "$CODE"
+  fi
+fi
+
+exec python3 "$HOOKS_DIR/hook-dispatcher.py" --run "$NAME" <<< "$INPUT"
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Resident hook dispatcher: runs the hook handlers (hook_handlers.py) in one
+long-lived interpreter, so a hook call costs a socket round-trip instead of
+a cold Python start per JSON field it reads.
+
+Usage:
+  python3 hook-dispatcher.py [--idle-exit SECONDS]
+  python3 hook-dispatcher.py --run NAME  < hook stdin
+  python3 hook-dispatcher.py --stop
+
+The hooks/*.sh shims hold no logic of their own (each names its handler in
+a "# Handler:" line) and exec hook-client.sh NAME, which sends the call to
+the dispatcher's Unix socket, $TMPDIR/claude-hooks-<uid>.sock, with nc -U.
+Without nc, or with no dispatcher listening, the client execs --run: that
+tries the socket once more, else runs the handler in its own interpreter and
+starts a dispatcher in the background for the next call
+(CLAUDE_HOOK_DAEMON=0 disables that). Either way the same handler decides,
+so allow (exit 0), block (exit 2) and warnings are unchanged.
+
+One call per connection:
+  request  NAME \\t PPID \\t CLAUDE_SESSION_ID \\t NBYTES \\t CWD \\n  hook stdin (NBYTES)
+  reply    EXIT_CODE \\n  then one line per output line: "1 " stdout, "2 " stderr
+
+Calls are handled on threads. The dispatcher picks up edits to
+hook_handlers.py without a restart and exits after --idle-exit seconds
+(default 1800) without calls.
+"""
+import sys, os, socket, threading, fcntl
+from contextlib import contextmanager
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def socket_path():
+    tmpdir = os.environ.get("TMPDIR", "/tmp").rstrip("/") or "/tmp"
+    return os.path.join(tmpdir, f"claude-hooks-{os.getuid()}.sock")
+
+
+def request(data, timeout=10):
+    """Send one raw request; the raw reply, or None if no dispatcher answered."""
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(socket_path())
+        s.sendall(data)
+        chunks = []
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks) or None
+    except OSError:
+        return None
+    finally:
+        s.close()
+
+
+def encode_request(name, ppid, session_id, cwd, raw):
+    return f"{name}\t{ppid}\t{session_id}\t{len(raw)}\t{cwd}\n".encode() + raw
+
+
+def encode_reply(code, stdout, stderr):
+    lines = [str(code)]
+    lines += ["1 " + line for text in stdout for line in (text.splitlines() or [""])]
+    lines += ["2 " + line for text in stderr for line in (text.splitlines() or [""])]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def emit_reply(reply):
+    """Write a reply to this process's stdout/stderr; returns the exit code,
+    or None if the reply is malformed."""
+    head, _, body = reply.decode(errors="replace").partition("\n")
+    if not head.isdigit():
+        return None
+    for line in body.splitlines():
+        if line.startswith("1 "):
+            sys.stdout.write(line[2:] + "\n")
+        elif line.startswith("2 "):
+            sys.stderr.write(line[2:] + "\n")
+    return int(head)
+
+
+_handlers = None
+_handlers_mtime = None
+_handlers_lock = threading.Lock()
+
+
+def handlers():
+    """hook_handlers, reloaded if the file changed since it was imported."""
+    global _handlers, _handlers_mtime
+    import importlib
+    try:
+        mtime = os.stat(os.path.join(HOOKS_DIR, "hook_handlers.py")).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _handlers_lock:
+        if _handlers is None:
+            if HOOKS_DIR not in sys.path:
+                sys.path.insert(0, HOOKS_DIR)
+            import hook_handlers
+            _handlers = hook_handlers
+        elif mtime != _handlers_mtime:
+            _handlers = importlib.reload(_handlers)
+        _handlers_mtime = mtime
+        return _handlers
+
+
+def dispatch(name, raw, cwd, ppid, session_id):
+    """Run one hook call; returns the encoded reply."""
+    h = handlers()
+    fn = h.HANDLERS.get(name)
+    if fn is None:
+        return encode_reply(1, [], [f"hook-dispatcher: no handler for {name!r}"])
+    call = h.Call(name, raw.decode(errors="replace"), cwd, ppid, session_id)
+    try:
+        code = fn(call)
+    except Exception as e:
+        # A broken handler is a non-blocking hook error, never a block
+        call.warn(f"hook-dispatcher: {name} failed: {e!r}")
+        code = 1
+    return encode_reply(code, call.stdout, call.stderr)
+
+
+@contextmanager
+def path_lock(path):
+    """flock on path + ".lock": starters and exiting dispatchers take it
+    around every check, removal and bind of the socket path, so none of them
+    removes a socket another has just bound."""
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def serve(idle_exit):
+    import socketserver, time
+
+    path = socket_path()
+    last_call = [time.monotonic()]
+    stopping = threading.Event()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            last_call[0] = time.monotonic()
+            self.connection.settimeout(5)
+            try:
+                header = self.rfile.readline().decode(errors="replace").rstrip("\n")
+                if header == "stop":
+                    stopping.set()
+                    self.wfile.write(encode_reply(0, [], []))
+                    return
+                name, ppid, session_id, nbytes, cwd = header.split("\t", 4)
+                raw = self.rfile.read(int(nbytes))
+                self.wfile.write(dispatch(name, raw, cwd, ppid, session_id))
+            except (OSError, ValueError):
+                pass
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    with path_lock(path):
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                return 0            # another dispatcher owns it
+            except OSError:
+                os.remove(path)     # stale socket from a dispatcher that died
+            finally:
+                probe.close()
+        try:
+            server = Server(path, Handler)
+        except OSError:
+            return 0
+        os.chmod(path, 0o600)
+        inode = os.stat(path).st_ino
+
+    def watch():
+        while not stopping.wait(min(30, idle_exit)):
+            if time.monotonic() - last_call[0] >= idle_exit:
+                break
+        server.shutdown()
+
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        # Only remove the path if it is still the socket this one bound
+        with path_lock(path):
+            server.server_close()
+            try:
+                if os.stat(path).st_ino == inode:
+                    os.remove(path)
+            except OSError:
+                pass
+    return 0
+
+
+def run(name):
+    """One hook call from this process's stdin: through the dispatcher if one
+    is up, else in process (starting a dispatcher for next time)."""
+    raw = sys.stdin.buffer.read()
+    cwd = os.getcwd()
+    ppid = os.getppid()
+    session_id = os.environ.get("CLAUDE_SESSION_ID", "")
+    reply = request(encode_request(name, ppid, session_id, cwd, raw))
+    code = emit_reply(reply) if reply else None
+    if code is not None:
+        return code
+    if os.environ.get("CLAUDE_HOOK_DAEMON", "1") != "0":
+        import subprocess
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+    return emit_reply(dispatch(name, raw, cwd, ppid, session_id))
+
+
+def main():
+    args = sys.argv[1:]
+    if "--run" in args:
+        i = args.index("--run")
+        if i + 1 >= len(args):
+            sys.exit(__doc__.strip())
+        sys.exit(run(args[i + 1]))
+    if "--stop" in args:
+        sys.exit(0 if request(b"stop\n") else 1)
+    idle_exit = 1800.0
+    if "--idle-exit" in args:
+        idle_exit = float(args[args.index("--idle-exit") + 1])
+    sys.exit(serve(idle_exit))
+
+
+if __name__ == "__main__":
+    main()
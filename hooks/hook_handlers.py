@@ -0,0 +1,572 @@
+"""
+Handlers behind the hooks/*.sh shims, run by hook-dispatcher.py.
+
+A handler gets the hook's Call and returns the hook's exit code: 0 allows,
+2 blocks (PreToolUse), anything else is a non-blocking error. call.warn()
+queues stderr lines (what Claude Code shows for a block or warning),
+call.say() stdout lines. Handlers live in a resident process, so module
+state persists between calls; keep it to caches that are safe to drop when
+the dispatcher restarts or reloads this file. State that must persist
+(markers, permissions, counters) goes in session_state.
+"""
+import json
+import os
+import re
+import subprocess
+import time
+
+import session_state
+
+HANDLERS = {}
+# For the commands hook messages tell the main session to run
+SESSION_STATE_CLI = "python3 /Users/kelsiandrews/.claude/hooks/session_state.py"
+
+RUNNING_STATES = ("in-progress", "in-review", "approved", "running", "testing", "reviewing", "merging")
+
+
+def handler(name):
+    """Register fn as the handler for hooks/<name>.sh."""
+    def register(fn):
+        HANDLERS[name] = fn
+        return fn
+    return register
+
+
+class Call:
+    """One hook invocation: its stdin JSON and the caller's environment."""
+
+    def __init__(self, name, raw, cwd, ppid, session_id):
+        self.name = name
+        self.cwd = cwd
+        self.ppid = ppid
+        self.session_id = session_id
+        try:
+            event = json.loads(raw) if raw.strip() else {}
+        except ValueError:
+            event = {}
+        self.event = event if isinstance(event, dict) else {}
+        self.stdout = []
+        self.stderr = []
+
+    @property
+    def session(self):
+        """The session's key in session_state: CLAUDE_SESSION_ID, else the
+        session_id every hook event carries (the caller's PPID only as a last
+        resort: it is not the same for every hook call)."""
+        session = self.session_id or str(self.event.get("session_id") or "")
+        return re.sub(r"[^a-zA-Z0-9-]", "", session) or f"ppid-{self.ppid}"
+
+    @property
+    def tool_input(self):
+        tool_input = self.event.get("tool_input")
+        return tool_input if isinstance(tool_input, dict) else {}
+
+    def file_path(self):
+        """tool_input.file_path, or tool_input.path for tools that use that."""
+        return str(self.tool_input.get("file_path") or self.tool_input.get("path", "") or "")
+
+    def warn(self, *lines):
+        self.stderr.extend(lines)
+
+    def say(self, *lines):
+        self.stdout.extend(lines)
+
+
+def _grep(pattern, text):
+    """grep -qE: does any line of text match pattern."""
+    return any(re.search(pattern, line) for line in text.splitlines())
+
+
+def state_file(name):
+    """$TMPDIR/claude-hooks-<name>-<uid>.json, for handler state that should
+    outlive the dispatcher (and be shared with --run fallbacks)."""
+    tmpdir = os.environ.get("TMPDIR", "/tmp").rstrip("/") or "/tmp"
+    return os.path.join(tmpdir, f"claude-hooks-{name}-{os.getuid()}.json")
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+def _write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def find_epics(roots, maxdepth):
+    """Yield */.claude/epics.json paths under roots, at most maxdepth levels
+    down (find -maxdepth), in walk order."""
+    for root in roots:
+        base = root.rstrip("/").count("/")
+        for dirpath, dirnames, filenames in os.walk(root):
+            depth = dirpath.rstrip("/").count("/") - base
+            if depth + 1 >= maxdepth:
+                dirnames[:] = []
+            if "epics.json" in filenames and os.path.basename(dirpath) == ".claude":
+                yield os.path.join(dirpath, "epics.json")
+
+
+# --- warn-sync-heavy-bash: PreToolUse Bash, advisory ---
+
+HEAVY_COMMANDS = (
+    (r'npm run (build|test|lint)\b', "build/test/lint command"),
+    (r'npx vitest|vite build', "build/test command"),
+    (r'git (push|rebase|fetch|merge)\b', "git network/rebase operation"),
+    (r'npm (install|ci)\b', "npm install"),
+)
+
+# Later matches win, as in the original chain of ifs
+FILE_OP_COMMANDS = (
+    (r'^find\b|[|;&] find\b', "Glob", "find"),
+    (r'^grep\b|^rg\b|[|;&] grep\b|[|;&] rg\b', "Grep", "grep/rg"),
+    (r'^(cat|head|tail)\s+[^|]', "Read", "cat/head/tail"),
+    (r'^(sed|awk)\s', "Edit", "sed/awk"),
+)
+
+
+@handler("warn-sync-heavy-bash")
+def warn_sync_heavy_bash(call):
+    run_in_bg = str(call.tool_input.get("run_in_background", False)).lower()
+    command = str(call.tool_input.get("command", ""))
+
+    if run_in_bg != "true":
+        for pattern, reason in HEAVY_COMMANDS:
+            if _grep(pattern, command):
+                call.warn("",
+                          f"PARALLELISM WARNING: '{reason}' is running synchronously.",
+                          "  If there is independent work (file reads, worktree setup, epics.json updates),",
+                          "  use run_in_background: true and proceed immediately.",
+                          "  Corrected call example:",
+                          f'    Bash(command: "{command}", run_in_background: true)',
+                          "  Only block on this result when the next action actually depends on it.")
+                break
+
+    file_op = None
+    for pattern, tool, reason in FILE_OP_COMMANDS:
+        if _grep(pattern, command):
+            file_op = (tool, reason)
+    if file_op:
+        tool, reason = file_op
+        call.warn("",
+                  f"TOOL SUGGESTION: '{reason}' detected — prefer the dedicated {tool} tool instead.",
+                  "  Dedicated tools have correct permissions, better output formatting, and avoid shell quoting issues.")
+    return 0
+
+
+# --- cost-alert: Stop, advisory ---
+
+COST_ALERT_CONFIG = "/Users/kelsiandrews/.claude/hooks/cost-alert-config.json"
+# Maintained by the tracker's token store on every commit (token_store.update_today)
+TODAY_FILE = os.path.join(".claude", "tracking", "today.json")
+
+
+def _tracking_root(cwd):
+    """The directory stop-hook.sh tracks for cwd: nearest one holding a .git
+    directory (so a worktree reports to its main checkout)."""
+    d = cwd
+    while d and d != "/":
+        if os.path.isdir(os.path.join(d, ".git")):
+            return d
+        d = os.path.dirname(d)
+    return None
+
+
+def _burn_rate(turns, now, window):
+    """Dollars per second over the turns that started in the last window seconds."""
+    recent = 0.0
+    for ts, cost in turns.values():
+        if ts is not None and now - window <= ts <= now:
+            recent += cost or 0
+    return recent / window
+
+
+@handler("cost-alert")
+def cost_alert(call):
+    try:
+        with open(COST_ALERT_CONFIG) as f:
+            config = json.loads(f.read().strip())
+    except Exception:
+        config = {}
+    try:
+        threshold = float(config.get("threshold_usd", 5.00))
+        window = float(config.get("burn_window_minutes", 60)) * 60
+    except (TypeError, ValueError):
+        return 0
+
+    root = _tracking_root(call.event.get("cwd") or call.cwd)
+    if not root:
+        return 0
+    today = _read_json(os.path.join(root, TODAY_FILE), None)
+    now = time.time()
+    if not isinstance(today, dict) or today.get("date") != time.strftime("%Y-%m-%d", time.gmtime(now)):
+        # Tracker not set up here, or nothing recorded yet today
+        return 0
+    try:
+        cost = float(today.get("cost") or 0)
+        rate = _burn_rate(today.get("turns") or {}, now, window) if window > 0 else 0.0
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+    if float(f"{cost:.2f}") >= threshold:
+        call.warn("", f"[cost-alert] Today: ${cost:.2f} / threshold: ${threshold:.2f} — consider reviewing usage")
+        return 0
+    # Project the recent pace to the end of the (UTC) day, so the warning
+    # comes while there is still budget left
+    projected = cost + rate * (86400 - now % 86400)
+    if projected >= threshold:
+        call.warn("", f"[cost-alert] Today: ${cost:.2f} / threshold: ${threshold:.2f} — "
+                      f"at ${rate * 3600:.2f}/h (last {window / 60:g} min) on pace for "
+                      f"${projected:.2f} by end of day (UTC)")
+    return 0
+
+
+# --- guard-protected-files: PreToolUse Edit|Write, blocks ---
+
+PROTECTED_FILES = ("BoardCanvas.jsx", "StickyNote.jsx", "Frame.jsx", "Shape.jsx", "LineShape.jsx", "Cursors.jsx")
+
+
+@handler("guard-protected-files")
+def guard_protected_files(call):
+    name = os.path.basename(call.file_path())
+    if name not in PROTECTED_FILES:
+        return 0
+    key = f"konva-permission:{name}"
+    if session_state.get(call.session, key):
+        # Permission granted for this session
+        return 0
+    call.warn(f"BLOCKED: {name} is a protected Konva file.",
+              f'Grant explicit permission first by saying: "I grant permission to edit {name}"',
+              f"This causes the main session to run: {SESSION_STATE_CLI} put {call.session} {key}")
+    return 2
+
+
+# --- guard-direct-edit: PreToolUse Edit|Write, blocks ---
+
+HOME_CLAUDE = "/Users/kelsiandrews/.claude/"
+EPICS_SEARCH_ROOT = "/Users/kelsiandrews"
+# session_state key (GLOBAL, set by the /hotfix skill) holding the file an
+# active hotfix may edit
+HOTFIX_KEY = "hotfix-active"
+
+
+# A fruitless walk of EPICS_SEARCH_ROOT is only repeated after this long
+EPICS_WALK_RETRY = 600
+
+_project_roots = {}     # cwd -> enclosing git checkout, or None
+_epics_index = None     # project root -> cached epics.json lookup, see _epics_entry
+
+
+def project_root(cwd):
+    """Nearest directory at or above cwd holding .git, remembered per cwd."""
+    if cwd not in _project_roots:
+        d = cwd
+        while d and not os.path.exists(os.path.join(d, ".git")):
+            parent = os.path.dirname(d)
+            d = None if parent == d else parent
+        _project_roots[cwd] = d
+    return _project_roots[cwd]
+
+
+def _load_epics_index():
+    global _epics_index
+    if _epics_index is None:
+        try:
+            _epics_index = {root: dict(e, write_files=frozenset(e.get("write_files", ())))
+                            for root, e in _read_json(state_file("epics"), {}).items()}
+        except Exception:
+            _epics_index = {}
+    return _epics_index
+
+
+def _save_epics_index():
+    _write_json(state_file("epics"), {root: dict(e, write_files=sorted(e["write_files"]))
+                                      for root, e in list(_epics_index.items())})
+
+
+def _index_epics(path, st):
+    """Cache entry for one epics.json: whether a story is running and the
+    union of the running stories' writeFiles."""
+    entry = {"epics": path, "mtime": st.st_mtime_ns, "size": st.st_size,
+             "error": False, "running": False, "write_files": frozenset()}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        running = [s for s in data.get("stories", []) if s.get("state") in RUNNING_STATES]
+        write_files = set()
+        for s in running:
+            for wf in s.get("writeFiles", []):
+                wf = str(wf)
+                wf = wf[2:] if wf.startswith("./") else wf
+                write_files.add(wf.rstrip("/") or wf)
+    except Exception:
+        entry["error"] = True
+        return entry
+    entry.update(running=bool(running), write_files=frozenset(write_files))
+    return entry
+
+
+def _epics_entry(cwd):
+    """The cached epics.json lookup for a session in cwd, or None if there is
+    no epics.json to check.
+
+    The project's own .claude/epics.json wins; without one, the first found
+    under EPICS_SEARCH_ROOT (the old home-directory search) is remembered for
+    the project. An entry is rebuilt when its file's (mtime, size) changes,
+    so once the cache is warm a guard call costs a couple of stats."""
+    index = _load_epics_index()
+    root = project_root(cwd) or cwd
+    entry = index.get(root)
+    own = os.path.join(root, ".claude", "epics.json")
+    if os.path.isfile(own):
+        path = own
+    elif entry and entry["epics"] and entry["epics"] != own and os.path.isfile(entry["epics"]):
+        path = entry["epics"]
+    elif entry and entry["epics"] is None and time.time() - entry["checked"] < EPICS_WALK_RETRY:
+        return None
+    else:
+        path = next(find_epics([EPICS_SEARCH_ROOT], 5), None)
+        if path is None:
+            index[root] = {"epics": None, "checked": time.time(), "write_files": frozenset()}
+            _save_epics_index()
+            return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if entry and entry["epics"] == path and (entry["mtime"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+        return entry
+    entry = index[root] = _index_epics(path, st)
+    _save_epics_index()
+    return entry
+
+
+def _in_write_files(file_path, write_files):
+    """Whether any run of whole path components of file_path is a writeFiles
+    entry: a file (relative or absolute) or a directory above it."""
+    parts = file_path.split("/")
+    return any("/".join(parts[i:j]) in write_files
+               for i in range(len(parts)) for j in range(i + 1, len(parts) + 1))
+
+
+def _story_scope(file_path, cwd):
+    """IN_WRITE_FILES, OUT_OF_SCOPE, NO_RUNNING_STORY or EPICS_UNAVAILABLE;
+    None when no epics.json was found."""
+    entry = _epics_entry(cwd)
+    if entry is None:
+        return None
+    if entry["error"]:
+        return "EPICS_UNAVAILABLE"
+    if not entry["running"]:
+        return "NO_RUNNING_STORY"
+    return "IN_WRITE_FILES" if _in_write_files(file_path, entry["write_files"]) else "OUT_OF_SCOPE"
+
+
+@handler("guard-direct-edit")
+def guard_direct_edit(call):
+    file_path = call.file_path()
+
+    # ~/.claude/ config, story worktrees, the project's own .claude/ directory
+    if file_path.startswith(HOME_CLAUDE) or "/.claude/" in file_path:
+        return 0
+    # Temp/plan files
+    if file_path.startswith("/tmp/") or file_path.startswith(os.environ.get("TMPDIR", "")):
+        return 0
+    # Active /hotfix — the key holds the allowed file path
+    allowed = session_state.get(session_state.GLOBAL, HOTFIX_KEY)
+    if allowed is not None and (allowed in file_path or file_path in allowed):
+        return 0
+
+    try:
+        scope = _story_scope(file_path, call.cwd)
+    except Exception:
+        scope = ""
+    if scope == "IN_WRITE_FILES":
+        # Coders run in worktrees, not the main session; belt-and-suspenders check
+        call.warn("BLOCKED: Direct edits to project source files are not allowed from the main session.",
+                  "This file is in the story's writeFiles, but edits must go through the coder in the worktree.",
+                  f"File attempted: {file_path}")
+    elif scope == "OUT_OF_SCOPE":
+        call.warn(f"BLOCKED: {file_path} is not in any running story's writeFiles.",
+                  "Add it to the plan or edit in the correct worktree.",
+                  f"File attempted: {file_path}")
+    else:
+        call.warn("BLOCKED: Direct edits to project source files are not allowed from the main session.",
+                  'Use /todo "description" to route the change through the pipeline.',
+                  f"File attempted: {file_path}")
+    return 2
+
+
+# --- stale-stories: SessionStart, advisory (load-session-context.sh) ---
+
+STALE_SECONDS = 86400  # 24 hours
+STALE_SEARCH_ROOTS = ("/Users/kelsiandrews/projects", "/Users/kelsiandrews/gauntlet",
+                      "/Users/kelsiandrews/.claude")
+# Discovered epics.json paths are reused by later sessions for this long
+EPICS_RESCAN = 86400
+
+
+def _stale_search(cwd):
+    """epics.json files to check: the cached result of the search under
+    STALE_SEARCH_ROOTS (redone after EPICS_RESCAN, or when a cached file has
+    gone), plus the session's own project's if it lies under those roots and
+    is missing from the cache."""
+    cache = _read_json(state_file("epics-found"), {})
+    found = cache.get("found") if cache.get("roots") == list(STALE_SEARCH_ROOTS) else None
+    if (found is None or time.time() - cache.get("scanned", 0) > EPICS_RESCAN
+            or not all(os.path.isfile(p) for p in found)):
+        found = list(find_epics(STALE_SEARCH_ROOTS, 6))
+        _write_json(state_file("epics-found"),
+                    {"roots": list(STALE_SEARCH_ROOTS), "scanned": time.time(), "found": found})
+    root = project_root(cwd)
+    own = os.path.join(root, ".claude", "epics.json") if root else None
+    if (own and own not in found and own.startswith(tuple(r + "/" for r in STALE_SEARCH_ROOTS))
+            and os.path.isfile(own)):
+        found = found + [own]
+    return found
+
+
+def _git_tip_time(project_root, rev):
+    try:
+        result = subprocess.run(["git", "-C", project_root, "log", "-1", "--format=%ct", rev],
+                                capture_output=True, text=True, timeout=5)
+        ts = result.stdout.strip()
+        return float(ts) if ts else None
+    except Exception:
+        return None
+
+
+def _branch_times(project_root, branches):
+    """{branch: tip commit time or None} for one repo: a single for-each-ref
+    for local and remote branches, git log only for names that are neither."""
+    refs = {}
+    try:
+        result = subprocess.run(
+            ["git", "-C", project_root, "for-each-ref", "--format=%(refname) %(committerdate:raw)",
+             "refs/heads", "refs/remotes"],
+            capture_output=True, text=True, timeout=5)
+        for line in result.stdout.splitlines():
+            ref, _, date = line.partition(" ")
+            if date:
+                refs[ref] = float(date.split()[0])
+    except Exception:
+        pass
+    times = {}
+    for branch in branches:
+        for ref in (branch, f"refs/heads/{branch}", f"refs/remotes/{branch}"):
+            if ref in refs:
+                times[branch] = refs[ref]
+                break
+        else:
+            times[branch] = _git_tip_time(project_root, branch)
+    return times
+
+
+@handler("stale-stories")
+def stale_stories(call):
+    """Warn about stories in a running-like state whose branch has had no
+    commit for STALE_SECONDS (or whose age cannot be told)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    now = time.time()
+    running = []    # (project_root, project_name, story), in epics.json order
+    for epics_path in _stale_search(call.cwd):
+        try:
+            with open(epics_path) as f:
+                stories = [s for s in json.load(f).get("stories", []) if s.get("state") in RUNNING_STATES]
+        except Exception:
+            continue
+        # project root is two levels up from .claude/epics.json
+        parts = epics_path.split("/")
+        try:
+            claude_idx = len(parts) - parts[::-1].index(".claude") - 1
+            root = "/".join(parts[:claude_idx])
+            name = parts[claude_idx - 1]
+        except ValueError:
+            root = "/".join(parts[:-2])
+            name = parts[-3] if len(parts) >= 3 else "?"
+        running += [(root, name, story) for story in stories]
+
+    # One for-each-ref per repo, repos in parallel
+    branches = {}
+    for root, _, story in running:
+        if story.get("branch"):
+            branches.setdefault(root, set()).add(story["branch"])
+    tips = {}
+    if branches:
+        with ThreadPoolExecutor(max_workers=min(8, len(branches))) as pool:
+            for root, times in zip(branches, pool.map(lambda r: _branch_times(r, branches[r]), branches)):
+                tips[root] = times
+
+    stale = []
+    for root, name, story in running:
+        branch = story.get("branch")
+        age_str = "unknown age"
+        ts = tips.get(root, {}).get(branch) if branch else None
+        if ts is not None:
+            age_secs = now - ts
+            if age_secs < STALE_SECONDS:
+                continue  # active — skip
+            age_str = f"{int(age_secs // 3600)}h ago"
+        stale.append((story, branch, age_str, name))
+
+    if stale:
+        call.say("", "=== STALE STORIES DETECTED ===")
+        for story, branch, age_str, name in stale:
+            call.say(f"  [{story.get('id', '?')}] {story.get('title', '?')}",
+                     f"    project: {name}  state: {story.get('state', '?')}  "
+                     f"branch: {branch or '(no branch)'}  last commit: {age_str}")
+        call.say("  Run /recover to resume or discard these stories.", "")
+    return 0
+
+
+# --- context-check: PostToolUse TaskUpdate, advisory ---
+
+@handler("context-check")
+def context_check(call):
+    # Only count completions
+    if call.tool_input.get("status", "") != "completed":
+        return 0
+    count = session_state.incr(call.session, "stories-closed")
+    if count >= 3:
+        call.warn("", "Context checkpoint reached (3 stories closed this session). Run `/clear` to reset "
+                      "the session. All epic and story state is saved in epics.json.")
+    return 0
+
+
+# --- mark-orch-read: PostToolUse Read / require-orch-read: PreToolUse Edit|Write|Task, blocks ---
+
+ORCH_READ_KEY = "orch-read"
+
+
+@handler("mark-orch-read")
+def mark_orch_read(call):
+    if str(call.tool_input.get("file_path", "")).endswith("ORCHESTRATION.md"):
+        session_state.put(call.session, ORCH_READ_KEY)
+    return 0
+
+
+@handler("require-orch-read")
+def require_orch_read(call):
+    if session_state.get(call.session, ORCH_READ_KEY):
+        return 0
+    call.warn("ORCHESTRATION.md has not been explicitly Read this session. Use the Read tool on "
+              "/Users/kelsiandrews/.claude/ORCHESTRATION.md before making code changes.")
+    return 2
+
+
+# --- session-start: SessionStart (load-session-context.sh) ---
+
+@handler("session-start")
+def session_start(call):
+    # The context was just injected, so no explicit Read is required this session
+    session_state.put(call.session, ORCH_READ_KEY)
+    return stale_stories(call)
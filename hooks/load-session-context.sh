@@ -20,86 +20,17 @@ echo "  2. Read the project CLAUDE.md (find it via Glob if path unknown)"
 echo "Answering without calling Read first is a violation of these rules."
 echo "=== END SESSION CONTEXT ==="
 
-# Satisfy the orch-read guard so no explicit Read is required this session
-SESSION_ID=$(echo "$CLAUDE_SESSION_ID" | tr -dc 'a-zA-Z0-9')
-touch "/tmp/orch-read-${SESSION_ID}"
-
+# The session-start handler (hook_handlers.py) satisfies the orch-read guard,
+# so no explicit Read is required this session, then runs the stale story check.
+#
 # Stale story check: warn if any story has been in a running-like state for >24h.
 # "Running-like" = in-progress, in-review, approved (anything not draft/ready/done/shipped).
 # Also matches old state names for backward compat.
 # Uses the story branch's last git commit time as a proxy for last activity.
-EPICS_FILES=$(find /Users/kelsiandrews/projects /Users/kelsiandrews/gauntlet /Users/kelsiandrews/.claude \
-  -maxdepth 6 -name "epics.json" -path "*/.claude/epics.json" 2>/dev/null)
-
-if [[ -n "$EPICS_FILES" ]]; then
-python3 - "$EPICS_FILES" <<'PYEOF'
-import json, subprocess, sys, time
-
-STALE_SECONDS = 86400  # 24 hours
-RUNNING_STATES = {"in-progress", "in-review", "approved", "running", "testing", "reviewing", "merging"}
-now = time.time()
-stale = []
-
-epics_files = sys.argv[1].strip().splitlines()
-
-for epics_path in epics_files:
-    epics_path = epics_path.strip()
-    if not epics_path:
-        continue
-    try:
-        with open(epics_path) as f:
-            data = json.load(f)
-    except Exception:
-        continue
-
-    # project root is two levels up from .claude/epics.json
-    parts = epics_path.split("/")
-    try:
-        claude_idx = len(parts) - parts[::-1].index(".claude") - 1
-        project_root = "/".join(parts[:claude_idx])
-        project_name = parts[claude_idx - 1]
-    except ValueError:
-        project_root = "/".join(parts[:-2])
-        project_name = parts[-3] if len(parts) >= 3 else "?"
-
-    for story in data.get("stories", []):
-        if story.get("state") not in RUNNING_STATES:
-            continue
-        branch = story.get("branch")
-        age_str = "unknown age"
-        if branch:
-            try:
-                result = subprocess.run(
-                    ["git", "-C", project_root, "log", "-1", "--format=%ct", branch],
-                    capture_output=True, text=True, timeout=5
-                )
-                ts = result.stdout.strip()
-                if ts:
-                    age_secs = now - float(ts)
-                    if age_secs < STALE_SECONDS:
-                        continue  # active — skip
-                    hours = int(age_secs // 3600)
-                    age_str = f"{hours}h ago"
-            except Exception:
-                pass  # can't determine age — still surface it
-        stale.append({
-            "id": story.get("id", "?"),
-            "title": story.get("title", "?"),
-            "state": story.get("state", "?"),
-            "branch": branch or "(no branch)",
-            "age": age_str,
-            "project": project_name,
-        })
-
-if stale:
-    print("")
-    print("=== STALE STORIES DETECTED ===")
-    for s in stale:
-        print(f"  [{s['id']}] {s['title']}")
-        print(f"    project: {s['project']}  state: {s['state']}  branch: {s['branch']}  last commit: {s['age']}")
-    print("  Run /recover to resume or discard these stories.")
-    print("")
-PYEOF
-fi
+# Runs as the stale-stories handler in the hook dispatcher:
+# one git for-each-ref per repo, repos in parallel, and the epics.json search
+# is cached between sessions.
+if [[ "${BASH_SOURCE[0]}" == */* ]]; then HOOKS_DIR="${BASH_SOURCE[0]%/*}"; else HOOKS_DIR=.; fi
+"$HOOKS_DIR/hook-client.sh" session-start || true
 
 exit 0
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Per-session hook state: the markers, permissions and counters the hooks
+used to keep as separate /tmp files, in one SQLite database,
+$TMPDIR/claude-hooks-state-<uid>.db.
+
+Values are strings keyed by (session, key). The session is the Claude Code
+session id (see Call.session in hook_handlers.py); GLOBAL holds state that
+is not tied to one session, such as the active /hotfix. incr() is a single
+transaction, so concurrent async hooks never lose a count. Rows untouched
+for EXPIRE_SECONDS are dropped.
+
+The hook handlers call get/put/incr/delete in the dispatcher's process. The
+main session and skills use the same store from the shell:
+
+  python3 session_state.py get SESSION KEY          (exit 1 if unset)
+  python3 session_state.py put SESSION KEY [VALUE]  (VALUE defaults to 1)
+  python3 session_state.py incr SESSION KEY [N]
+  python3 session_state.py delete SESSION KEY
+
+with SESSION "-" for GLOBAL.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+GLOBAL = "-"
+EXPIRE_SECONDS = 7 * 86400
+
+_db = None
+_db_path = None
+_lock = threading.Lock()
+
+
+def db_path():
+    tmpdir = os.environ.get("TMPDIR", "/tmp").rstrip("/") or "/tmp"
+    return os.path.join(tmpdir, f"claude-hooks-state-{os.getuid()}.db")
+
+
+def _connect():
+    """The shared connection, opened (and pruned) on first use. Callers hold _lock."""
+    global _db, _db_path
+    path = db_path()
+    if _db is None or _db_path != path:
+        fresh = not os.path.exists(path)
+        db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        if fresh:
+            os.chmod(path, 0o600)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS state (
+            session TEXT NOT NULL, key TEXT NOT NULL, value TEXT, updated REAL,
+            PRIMARY KEY (session, key))""")
+        db.execute("DELETE FROM state WHERE updated < ?", (time.time() - EXPIRE_SECONDS,))
+        _db, _db_path = db, path
+    return _db
+
+
+def get(session, key, default=None):
+    with _lock:
+        row = _connect().execute(
+            "SELECT value FROM state WHERE session = ? AND key = ?", (session, key)).fetchone()
+    return row[0] if row else default
+
+
+def put(session, key, value="1"):
+    with _lock:
+        _connect().execute(
+            "INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)",
+            (session, key, str(value), time.time()))
+
+
+def incr(session, key, n=1):
+    """Add n to an integer value (unset or non-numeric counts as 0); returns
+    the new value."""
+    with _lock:
+        db = _connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT value FROM state WHERE session = ? AND key = ?", (session, key)).fetchone()
+            try:
+                value = int(row[0]) + n if row else n
+            except (TypeError, ValueError):
+                value = n
+            db.execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)",
+                       (session, key, str(value), time.time()))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    return value
+
+
+def delete(session, key):
+    with _lock:
+        _connect().execute("DELETE FROM state WHERE session = ? AND key = ?", (session, key))
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 3 or args[0] not in ("get", "put", "incr", "delete"):
+        sys.exit(__doc__.strip())
+    op, session, key = args[:3]
+    if op == "get":
+        value = get(session, key)
+        if value is None:
+            sys.exit(1)
+        print(value)
+    elif op == "put":
+        put(session, key, args[3] if len(args) > 3 else "1")
+    elif op == "incr":
+        print(incr(session, key, int(args[3]) if len(args) > 3 else 1))
+    else:
+        delete(session, key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Columnar turn aggregation shared by the tracking scripts.
+
+TurnColumns loads the live turns once into parallel array('q')/array('d')
+columns, with dates, models and session ids interned to small integers, so
+a large store costs a few machine words per turn instead of a dict each.
+aggregate() then makes one fused pass over the columns and produces every
+total and group-by the reports need, in the same shape as the store's
+summary(), plus the per-turn running totals the dashboard plots.
+
+Reports that only need daily totals should keep using store.summary(), which
+is served from the rollups; the columns are for anything that needs the
+individual turns.
+
+Filtered queries (cost-summary's --since/--until/--model/--session and
+--group-by) load only the requested date range from the store, then use
+the columns' sorted day index: select() bisects it for the range and
+group_turns() buckets what is left by hour, day, week, model or session.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date as _date
+
+from token_store import ROLLUP_FIELDS, rollup_count, summarize_groups
+
+FIELDS = ("date", "session_id", "turn_index", "model", "input_tokens",
+          "cache_creation_tokens", "cache_read_tokens", "output_tokens",
+          "total_tokens", "estimated_cost_usd", "duration_seconds", "project")
+GROUP_BY = ("hour", "day", "week", "model", "session")
+
+
+class Interner:
+    """Maps strings to dense integer ids and back."""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def __call__(self, value):
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class TurnColumns:
+    """Live turns as parallel columns, in (date, session_id, turn_index) order."""
+
+    def __init__(self):
+        self.dates = Interner()
+        self.models = Interner()
+        self.sessions = Interner()
+        self.project = None
+
+        self.date = array("q")
+        self.model = array("q")
+        self.session = array("q")
+        self.turn_index = array("q")
+        self.input = array("q")
+        self.cache_create = array("q")
+        self.cache_read = array("q")
+        self.output = array("q")
+        self.total = array("q")
+        self.duration = array("q")
+        self.cost = array("d")
+        self.hour = array("b")      # UTC hour of turn_timestamp, -1 if unknown
+        self._days = None
+
+    def __len__(self):
+        return len(self.date)
+
+    @classmethod
+    def from_store(cls, store, since=None, until=None, hours=False):
+        """Columns for the store's turns dated since..until (inclusive, all
+        of them by default); hours also loads the hour column."""
+        cols = cls()
+        fields = FIELDS + ("turn_timestamp",) if hours else FIELDS
+        cols.extend(store.iter_rows(fields, since, until))
+        return cols
+
+    def extend(self, rows):
+        """Append (FIELDS...) tuples, optionally followed by turn_timestamp."""
+        date, model, session = self.dates, self.models, self.sessions
+        self._days = None
+        for (d, sid, ti, m, inp, cc, cr, out, tot, cost, dur, project, *ts) in rows:
+            if ts:
+                t = ts[0] or ""
+                self.hour.append(int(t[11:13]) if t[11:13].isdigit() else -1)
+            if self.project is None and project:
+                self.project = project
+            self.date.append(date(d or "unknown"))
+            self.model.append(model(m or "unknown"))
+            self.session.append(session(sid or ""))
+            self.turn_index.append(int(ti or 0))
+            self.input.append(int(inp or 0))
+            self.cache_create.append(int(cc or 0))
+            self.cache_read.append(int(cr or 0))
+            self.output.append(int(out or 0))
+            self.total.append(int(tot or 0))
+            self.duration.append(int(dur or 0))
+            self.cost.append(cost or 0.0)
+
+
+def aggregate(cols):
+    """One pass over cols: summary-shaped totals and group-bys, plus
+
+      groups               (date, model) -> ROLLUP_FIELDS counters
+      session_dates        session_id -> earliest date
+      cumulative_cost      running cost after each turn (array('d'))
+      cumulative_duration  running duration after each turn (array('q'))
+    """
+    n_models = len(cols.models)
+    rows = {}                   # date_id * n_models + model_id -> counters
+    first_date = {}             # session id -> date id
+    token_sessions = set()
+    cumulative_cost = array("d")
+    cumulative_duration = array("q")
+    running_cost = 0
+    running_duration = 0
+
+    for d, m, s, inp, cc, cr, out, tot, dur, cost in zip(
+            cols.date, cols.model, cols.session, cols.input, cols.cache_create,
+            cols.cache_read, cols.output, cols.total, cols.duration, cols.cost):
+        key = d * n_models + m
+        r = rows.get(key)
+        if r is None:
+            r = rows[key] = dict.fromkeys(ROLLUP_FIELDS, 0)
+        rollup_count(r, cost, inp, cc, cr, out, tot, dur)
+
+        if s not in first_date:
+            first_date[s] = d
+        if tot > 0:
+            token_sessions.add(s)
+
+        running_cost += cost
+        running_duration += dur
+        cumulative_cost.append(running_cost)
+        cumulative_duration.append(running_duration)
+
+    groups = {(cols.dates[key // n_models], cols.models[key % n_models]): r
+              for key, r in rows.items()}
+    result = summarize_groups(groups, len(first_date), len(token_sessions))
+    result["groups"] = groups
+    result["session_dates"] = {cols.sessions[s]: cols.dates[d] for s, d in first_date.items()}
+    result["cumulative_cost"] = cumulative_cost
+    result["cumulative_duration"] = cumulative_duration
+    return result
+
+
+def _sorted_days(cols):
+    """(day keys, first row of each day, end of the last dated row) over the
+    dated rows, which must be in date order. Undated rows are left out of
+    the index: the SQLite store yields them first and the segment store last
+    (its "unknown" month), so they lead or trail the dated rows."""
+    if cols._days is None:
+        undated = cols.dates.ids.get("unknown")
+        keys = []
+        starts = array("q")
+        end = 0
+        prev = None
+        for i, d in enumerate(cols.date):
+            if d == undated:
+                continue
+            if d != prev:
+                keys.append(cols.dates[d])
+                starts.append(i)
+                prev = d
+            end = i + 1
+        cols._days = (keys, starts, end)
+    return cols._days
+
+
+def select(cols, since=None, until=None, model=None, session=None):
+    """Row numbers of the turns dated since..until (inclusive) whose model
+    contains model and whose session id starts with session."""
+    keys, starts, end = _sorted_days(cols)
+    lo, hi = 0, len(cols)
+    if since or until:
+        # A date range never includes undated rows
+        lo, hi = (starts[0], end) if keys else (0, 0)
+    if since:
+        i = bisect_left(keys, since)
+        lo = starts[i] if i < len(keys) else end
+    if until:
+        i = bisect_right(keys, until)
+        hi = starts[i] if i < len(keys) else end
+    if model is None and session is None:
+        return range(lo, hi)
+    models = None if model is None else {
+        i for i, m in enumerate(cols.models.values) if model in m}
+    sessions = None if session is None else {
+        i for i, s in enumerate(cols.sessions.values) if s.startswith(session)}
+    return [i for i in range(lo, hi)
+            if (models is None or cols.model[i] in models)
+            and (sessions is None or cols.session[i] in sessions)]
+
+
+def take(cols, rows):
+    """New columns holding only the given rows (sharing the interners)."""
+    sub = TurnColumns()
+    sub.dates, sub.models, sub.sessions = cols.dates, cols.models, cols.sessions
+    sub.project = cols.project
+    for name in ("date", "model", "session", "turn_index", "input", "cache_create",
+                 "cache_read", "output", "total", "duration", "cost", "hour"):
+        src = getattr(cols, name)
+        if len(src) == len(cols):
+            getattr(sub, name).extend(src[i] for i in rows)
+    return sub
+
+
+def _week(day):
+    try:
+        y, w, _ = _date.fromisoformat(day).isocalendar()
+        return f"{y}-W{w:02d}"
+    except ValueError:
+        return day
+
+
+def group_turns(cols, by):
+    """Group key -> ROLLUP_FIELDS counters plus "sessions" (distinct
+    sessions), grouping by one of GROUP_BY. "hour" needs the hour column
+    (from_store(..., hours=True)); hours are UTC like the dates."""
+    if by == "hour":
+        keys = [f"{cols.dates[d]} {h:02d}:00" if h >= 0 else f"{cols.dates[d]} ??:00"
+                for d, h in zip(cols.date, cols.hour)]
+    elif by == "day":
+        keys = [cols.dates[d] for d in cols.date]
+    elif by == "week":
+        weeks = [_week(d) for d in cols.dates.values]
+        keys = [weeks[d] for d in cols.date]
+    elif by == "model":
+        keys = [cols.models[m] for m in cols.model]
+    elif by == "session":
+        keys = [cols.sessions[s] for s in cols.session]
+    else:
+        raise ValueError(f"group by must be one of {', '.join(GROUP_BY)}")
+
+    rows = {}
+    sessions = {}
+    for key, s, inp, cc, cr, out, tot, dur, cost in zip(
+            keys, cols.session, cols.input, cols.cache_create, cols.cache_read,
+            cols.output, cols.total, cols.duration, cols.cost):
+        r = rows.get(key)
+        if r is None:
+            r = rows[key] = dict.fromkeys(ROLLUP_FIELDS, 0)
+            sessions[key] = set()
+        rollup_count(r, cost, inp, cc, cr, out, tot, dur)
+        sessions[key].add(s)
+    for key, r in rows.items():
+        r["sessions"] = len(sessions[key])
+    return rows
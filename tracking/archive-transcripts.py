@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Compress a project's old transcripts in ~/.claude/projects/<slug>/.
+
+Usage:
+  python3 archive-transcripts.py <project_root> [--days N] [--gzip] [--dry-run]
+
+Every <session>.jsonl not modified for --days days (default 30) is written
+to <session>.jsonl.zst when the zstandard module is installed, else (or
+with --gzip) to <session>.jsonl.gz, keeping its mtime. Next to it goes a
+<session>.summary.json sidecar:
+
+  {"session_id", "cwd", "turns", "input", "cache_create", "cache_read",
+   "output", "cost", "first_date", "last_date", "human", "trivial",
+   "bytes"}
+
+and the original is removed. The tracking scripts read archives through
+streaming decompression and use the sidecar when it is enough: backfill
+skips an archive whose turns are all in the store, generate-charts takes
+the human prompt counts from it. Backfill cursors are moved to the archive,
+so the next backfill does not even open it.
+
+Claude Code's own /resume only lists plain transcripts, so archived sessions
+can no longer be resumed.
+"""
+import sys, os, json, gzip, shutil, time
+
+from backfill import load_cursors, save_cursors
+from token_store import open_store
+from transcripts import (SIDECAR_SUFFIX, compute_turns, count_human_messages, is_archived,
+                         list_transcripts, parse_turns, session_id_of, zstandard)
+
+args = sys.argv[1:]
+dry_run = "--dry-run" in args
+use_gzip = "--gzip" in args or zstandard is None
+args = [a for a in args if a not in ("--dry-run", "--gzip")]
+days = 30
+if "--days" in args:
+    i = args.index("--days")
+    days = int(args[i + 1])
+    del args[i:i + 2]
+if not args:
+    sys.exit(__doc__.strip())
+
+project_root = os.path.abspath(args[0])
+project_name = os.path.basename(project_root)
+tracking_dir = os.path.join(project_root, ".claude", "tracking")
+cursors_file = os.path.join(tracking_dir, "backfill-cursors.json")
+transcripts_dir = os.path.expanduser("~/.claude/projects/" + project_root.replace("/", "-"))
+
+if not os.path.isdir(transcripts_dir):
+    print("No transcript directory found, nothing to archive.")
+    sys.exit(0)
+
+
+def transcript_cwd(jf):
+    with open(jf, "rb") as f:
+        for _, line in zip(range(20), f):
+            if b'"cwd"' in line:
+                try:
+                    cwd = json.loads(line).get("cwd")
+                except Exception:
+                    continue
+                if cwd:
+                    return cwd
+    return None
+
+
+def summarize(jf, session_id, size):
+    result = parse_turns(jf)
+    if result is None:
+        return None
+    msgs, first_ts, model, usages, _ = result
+    entries, _ = compute_turns(msgs, usages, first_ts, model, session_id, project_name)
+    human, trivial, _ = count_human_messages(jf)
+    dates = sorted(e["date"] for e in entries if e["date"])
+    return {
+        "session_id": session_id,
+        "cwd": transcript_cwd(jf),
+        "turns": len(entries),
+        "input": sum(e["input_tokens"] for e in entries),
+        "cache_create": sum(e["cache_creation_tokens"] for e in entries),
+        "cache_read": sum(e["cache_read_tokens"] for e in entries),
+        "output": sum(e["output_tokens"] for e in entries),
+        "cost": round(sum(e["estimated_cost_usd"] for e in entries), 4),
+        "first_date": dates[0] if dates else None,
+        "last_date": dates[-1] if dates else None,
+        "human": human,
+        "trivial": trivial,
+        "bytes": size,
+    }
+
+
+def compress(jf, dest):
+    tmp = dest + ".tmp"
+    with open(jf, "rb") as src:
+        if use_gzip:
+            with gzip.open(tmp, "wb", compresslevel=6) as out:
+                shutil.copyfileobj(src, out, 1 << 20)
+        else:
+            with open(tmp, "wb") as fh:
+                with zstandard.ZstdCompressor(level=10).stream_writer(fh) as out:
+                    shutil.copyfileobj(src, out, 1 << 20)
+    os.replace(tmp, dest)
+
+
+cutoff = time.time() - days * 86400
+suffix = ".jsonl.gz" if use_gzip else ".jsonl.zst"
+store = open_store(tracking_dir) if os.path.isdir(tracking_dir) else None
+cursors = load_cursors(cursors_file, store) if store is not None else {}
+cursors_changed = False
+archived = 0
+bytes_before = 0
+bytes_after = 0
+
+for jf in list_transcripts(transcripts_dir):
+    if is_archived(jf):
+        continue
+    st = os.stat(jf)
+    if st.st_mtime >= cutoff:
+        continue
+    sid = session_id_of(jf)
+    if dry_run:
+        print(f"  would archive {sid[:8]}  {st.st_size / 2 ** 20:.1f} MiB")
+        archived += 1
+        bytes_before += st.st_size
+        continue
+
+    sidecar = summarize(jf, sid, st.st_size)
+    if sidecar is None:
+        continue
+    dest = os.path.join(transcripts_dir, sid + suffix)
+    compress(jf, dest)
+    after = os.stat(jf)
+    if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        # The session came back to life while we were compressing it
+        os.remove(dest)
+        continue
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    side_file = os.path.join(transcripts_dir, sid + SIDECAR_SUFFIX)
+    with open(side_file + ".tmp", "w") as f:
+        json.dump(sidecar, f)
+    os.replace(side_file + ".tmp", side_file)
+    os.remove(jf)
+
+    # Offsets count decompressed bytes, so a cursor stays valid once moved
+    cursor = cursors.get(sid)
+    if cursor and (cursor.get("ino"), cursor.get("size"), cursor.get("mtime")) == \
+            (st.st_ino, st.st_size, st.st_mtime_ns):
+        new = os.stat(dest)
+        cursor.update(ino=new.st_ino, size=new.st_size, mtime=new.st_mtime_ns)
+        cursors_changed = True
+
+    archived += 1
+    bytes_before += st.st_size
+    bytes_after += os.path.getsize(dest)
+    print(f"  archived {sid[:8]}  {st.st_size / 2 ** 20:.1f} -> {os.path.getsize(dest) / 2 ** 20:.1f} MiB")
+
+if cursors_changed:
+    save_cursors(cursors_file, store, cursors)
+
+if dry_run:
+    print(f"{archived} transcript(s) older than {days} days would be archived "
+          f"({bytes_before / 2 ** 20:.1f} MiB).")
+else:
+    print(f"{archived} transcript(s) archived, "
+          f"{bytes_before / 2 ** 20:.1f} MiB -> {bytes_after / 2 ** 20:.1f} MiB.")
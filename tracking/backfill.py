@@ -1,232 +1,268 @@
 #!/usr/bin/env python3
 """
-Backfill historical Claude Code sessions into tokens.json.
+Backfill historical Claude Code sessions into the token store.
 
 Usage:
-  python3 backfill.py <project_root>
-
-Scans ~/.claude/projects/<slug>/*.jsonl for transcripts belonging to the
-given project, parses token usage from each turn, and upserts entries to
-<project_root>/.claude/tracking/tokens.json. Sessions where all turns are
+  python3 backfill.py <project_root> [--no-charts] [--jobs N] [--profile] [transcript.jsonl ...]
+
+Scans ~/.claude/projects/<slug>/ for transcripts (*.jsonl, and archived
+*.jsonl.gz / *.jsonl.zst, see archive-transcripts.py) belonging to the
+given project (or only the transcripts passed on the command line), parses
+token usage from each turn, and appends new or changed entries to the
+token store in <project_root>/.claude/tracking/ (month segments under
+tokens/, or tokens.db — see token_store.py). Sessions where all turns are
 already present are skipped.
 
-Old-format entries (no turn_index field) are replaced with per-turn entries.
-"""
-import sys, json, os, glob
-from datetime import datetime
-
-project_root = os.path.abspath(sys.argv[1])
-project_name = os.path.basename(project_root)
-tracking_dir = os.path.join(project_root, ".claude", "tracking")
-tokens_file = os.path.join(tracking_dir, "tokens.json")
+A cursor per transcript (inode, size, mtime, byte offset and the parser state
+at that offset) is kept in <project_root>/.claude/tracking/backfill-cursors.json.
+Unchanged transcripts are skipped after a single stat; transcripts that only
+grew are parsed from the saved offset. Archives never grow: one without a
+matching cursor is skipped unread when its sidecar summary shows the store
+already holds all of its turns.
 
-# Claude Code slugifies project paths: replace "/" with "-"
-slug = project_root.replace("/", "-")
-transcripts_dir = os.path.expanduser("~/.claude/projects/" + slug)
+--jobs N parses transcripts in N worker processes (0 = one per CPU). Workers
+only parse; their per-session turn lists are merged into the store by this
+process, so there is still a single writer.
 
-if not os.path.isdir(transcripts_dir):
-    print("No transcript directory found, nothing to backfill.")
-    sys.exit(0)
+Old-format entries (no turn_index field) are replaced with per-turn entries.
 
-# Load existing data
-data = []
-if os.path.exists(tokens_file):
-    try:
-        with open(tokens_file) as f:
-            data = json.load(f)
-    except Exception:
-        data = []
+--profile (or CLAUDE_TRACKER_PROFILE=1) appends per-phase timings to
+<project_root>/.claude/tracking/metrics.jsonl; see profiling.py.
+"""
+import sys, json, os
+from concurrent.futures import ProcessPoolExecutor
 
-# Remove old-format entries (no turn_index) — they will be re-processed
-old_sessions = {e.get("session_id") for e in data if "turn_index" not in e}
-data = [e for e in data if "turn_index" in e]
+import profiling
+from token_store import open_store, tombstone, write_lock
+from transcripts import (is_archived, list_transcripts, parse_session, read_sidecar,
+                         row_to_entry, session_id_of)
 
-# Build index of existing (session_id, turn_index) pairs
-existing_turns = {(e.get("session_id"), e.get("turn_index")) for e in data}
 
-# Count turns per known session
-turns_per_session = {}
-for e in data:
-    sid = e.get("session_id")
-    turns_per_session[sid] = turns_per_session.get(sid, 0) + 1
+def parse_args(argv):
+    args = []
+    jobs = 1
+    regen_charts = True
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == "--no-charts":
+            regen_charts = False
+        elif a == "--jobs":
+            i += 1
+            jobs = int(argv[i]) if i < len(argv) else 1
+        elif a.startswith("--jobs="):
+            jobs = int(a.split("=", 1)[1])
+        else:
+            args.append(a)
+        i += 1
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return args, jobs, regen_charts
 
-def parse_turns(jf):
-    """Parse a JSONL transcript into per-turn entries. Returns list of dicts."""
-    msgs = []       # (role, timestamp)
-    usages = []     # usage dicts from assistant messages, in order
-    model = "unknown"
-    first_ts = None
 
+def load_cursors(cursors_file, store):
+    """Per-transcript cursors, discarded if the store they describe was recreated."""
     try:
-        with open(jf) as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                    ts = obj.get("timestamp")
-                    if ts and first_ts is None:
-                        first_ts = ts
-                    t = obj.get("type")
-                    if t == "user" and not obj.get("isSidechain") and ts:
-                        msgs.append(("user", ts))
-                    elif t == "assistant" and ts:
-                        msgs.append(("assistant", ts))
-                    msg = obj.get("message", {})
-                    if isinstance(msg, dict) and msg.get("role") == "assistant":
-                        usage = msg.get("usage", {})
-                        if usage:
-                            usages.append(usage)
-                        m = msg.get("model", "")
-                        if m:
-                            model = m
-                except Exception:
-                    pass
+        with open(cursors_file) as f:
+            saved = json.load(f)
     except Exception:
-        return [], None, "unknown"
-
-    return msgs, first_ts, model, usages
+        return {}
+    if saved.get("store_id") != store.store_id():
+        return {}
+    return saved.get("files", {})
+
+
+def save_cursors(cursors_file, store, cursors, forget=()):
+    """Write cursors, merged under the store's write lock with any other
+    run's saved meanwhile: per transcript the cursor furthest into the same
+    file wins, so concurrent runs never move a cursor backwards. Sessions
+    in forget are dropped."""
+    tracking_dir = os.path.dirname(cursors_file)
+    os.makedirs(tracking_dir, exist_ok=True)
+    with write_lock(tracking_dir):
+        merged = dict(load_cursors(cursors_file, store))
+        for sid in forget:
+            merged.pop(sid, None)
+        for sid, c in cursors.items():
+            other = merged.get(sid)
+            if (other is None or other.get("ino") != c.get("ino")
+                    or other.get("offset", 0) <= c.get("offset", 0)):
+                merged[sid] = c
+        tmp = cursors_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"store_id": store.store_id(), "files": merged}, f)
+        os.replace(tmp, cursors_file)
+
+
+def _parse_job(job):
+    jf, session_id, project_name, offset, state = job
+    return parse_session(jf, session_id, project_name, offset, state)
+
+
+def backfill(store, project_name, jsonl_files, cursors, jobs=1):
+    """Parse new/grown transcripts and write their turns to the store.
+
+    cursors is updated in place. Returns (sessions_processed, new_entries,
+    cursors_changed).
+    """
+    cursors_changed = False
+
+    # Decide what to parse: one stat per transcript, no reads yet
+    work = []   # (jf, session_id, stat, cursor)
+    existing = None   # (old_sessions, turns_per_session), looked up on first need
+    for jf in jsonl_files:
+        session_id = session_id_of(jf)
 
-def compute_turns(msgs, usages, first_ts, model, session_id, project_name):
-    """Convert message list + usages into per-turn entry dicts."""
-    entries = []
-    turn_index = 0
-    usage_index = 0
-    i = 0
-
-    # Date from first timestamp
-    session_date = None
-    if first_ts:
         try:
-            session_date = datetime.fromisoformat(
-                first_ts.replace("Z", "+00:00")
-            ).strftime("%Y-%m-%d")
-        except Exception:
-            pass
-
-    while i < len(msgs):
-        if msgs[i][0] == "user":
-            user_ts = msgs[i][1]
-            j = i + 1
-            while j < len(msgs) and msgs[j][0] != "assistant":
-                j += 1
-            if j < len(msgs):
-                asst_ts = msgs[j][1]
-                # Consume next usage block for this turn
-                usage = {}
-                if usage_index < len(usages):
-                    usage = usages[usage_index]
-                    usage_index += 1
-
-                inp = usage.get("input_tokens", 0)
-                out = usage.get("output_tokens", 0)
-                cache_create = usage.get("cache_creation_input_tokens", 0)
-                cache_read = usage.get("cache_read_input_tokens", 0)
-                total = inp + cache_create + cache_read + out
-
-                if total == 0:
-                    # Skip turns with no token data
-                    i = j + 1
-                    turn_index += 1
-                    continue
-
-                duration = 0
-                try:
-                    t0 = datetime.fromisoformat(user_ts.replace("Z", "+00:00"))
-                    t1 = datetime.fromisoformat(asst_ts.replace("Z", "+00:00"))
-                    duration = max(0, int((t1 - t0).total_seconds()))
-                except Exception:
-                    pass
-
-                if "opus" in model:
-                    cost = inp * 15 / 1e6 + cache_create * 18.75 / 1e6 + cache_read * 1.50 / 1e6 + out * 75 / 1e6
-                else:
-                    cost = inp * 3 / 1e6 + cache_create * 3.75 / 1e6 + cache_read * 0.30 / 1e6 + out * 15 / 1e6
-
-                # Turn timestamp = user message timestamp
-                turn_ts = user_ts
-                # Normalize to Z format
-                try:
-                    turn_ts = datetime.fromisoformat(user_ts.replace("Z", "+00:00")).strftime("%Y-%m-%dT%H:%M:%SZ")
-                except Exception:
-                    pass
-
-                # Use date from this turn's timestamp if possible
-                turn_date = session_date
-                try:
-                    turn_date = datetime.fromisoformat(user_ts.replace("Z", "+00:00")).strftime("%Y-%m-%d")
-                except Exception:
-                    pass
-
-                entries.append({
-                    "date": turn_date or session_date,
-                    "project": project_name,
-                    "session_id": session_id,
-                    "turn_index": turn_index,
-                    "turn_timestamp": turn_ts,
-                    "input_tokens": inp,
-                    "cache_creation_tokens": cache_create,
-                    "cache_read_tokens": cache_read,
-                    "output_tokens": out,
-                    "total_tokens": total,
-                    "estimated_cost_usd": round(cost, 4),
-                    "model": model,
-                    "duration_seconds": duration,
-                })
-                turn_index += 1
-                i = j + 1
-            else:
-                i += 1
+            st = os.stat(jf)
+        except OSError:
+            continue
+
+        # A cursor is only trusted if it describes the same file
+        cursor = cursors.get(session_id)
+        if cursor and cursor.get("ino") == st.st_ino:
+            if cursor.get("size") == st.st_size and cursor.get("mtime") == st.st_mtime_ns:
+                continue
+            if st.st_size <= cursor.get("offset", 0) or is_archived(jf):
+                # Shrunk or rewritten in place — start over
+                cursor = None
         else:
-            i += 1
-
-    return entries
-
-# Find all JSONL transcripts
-jsonl_files = sorted(glob.glob(os.path.join(transcripts_dir, "*.jsonl")))
-new_entries = []
-sessions_processed = 0
-
-for jf in jsonl_files:
-    session_id = os.path.splitext(os.path.basename(jf))[0]
-
-    result = parse_turns(jf)
-    if len(result) == 4:
-        msgs, first_ts, model, usages = result
+            cursor = None
+
+        sidecar = read_sidecar(jf) if cursor is None else None
+        if sidecar is not None:
+            if existing is None:
+                existing = store.session_index()
+            old_sessions, turns_per_session = existing
+            if (turns_per_session.get(session_id, 0) >= sidecar.get("turns", 0)
+                    and session_id not in old_sessions):
+                cursors[session_id] = {"ino": st.st_ino, "size": st.st_size,
+                                       "mtime": st.st_mtime_ns, "offset": 0, "state": None}
+                cursors_changed = True
+                continue
+        work.append((jf, session_id, st, cursor))
+
+    jobs_args = [(jf, sid, project_name, cursor["offset"] if cursor else 0,
+                  cursor["state"] if cursor else None)
+                 for jf, sid, _, cursor in work]
+    if jobs > 1 and len(work) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(jobs, len(work)))
+        results = pool.map(_parse_job, jobs_args, chunksize=max(1, len(work) // (jobs * 4)))
     else:
-        continue
-
-    turn_entries = compute_turns(msgs, usages, first_ts, model, session_id, project_name)
-
-    if not turn_entries:
-        continue
-
-    expected_count = len(turn_entries)
-    existing_count = turns_per_session.get(session_id, 0)
-
-    # If all turns already present and session not in old-format set, skip
-    if existing_count >= expected_count and session_id not in old_sessions:
-        continue
-
-    # Upsert: replace any existing turns for this session with fresh data
-    data = [e for e in data if e.get("session_id") != session_id]
-    data.extend(turn_entries)
-    new_entries.extend(turn_entries)
-    sessions_processed += 1
-
-# Sort by (date, session_id, turn_index)
-data.sort(key=lambda x: (x.get("date", ""), x.get("session_id", ""), x.get("turn_index", 0)))
-
-# Write updated tokens.json
-if new_entries:
-    os.makedirs(os.path.dirname(tokens_file), exist_ok=True)
-    with open(tokens_file, "w") as f:
-        json.dump(data, f, indent=2)
-        f.write("\n")
-
-total_turns = len(new_entries)
-print(f"{sessions_processed} session{'s' if sessions_processed != 1 else ''} processed, {total_turns} turn{'s' if total_turns != 1 else ''} written.")
+        pool = None
+        results = map(_parse_job, jobs_args)
+
+    # Single writer: merge worker results in transcript order
+    profiling.mark("parse")
+    profiling.count("transcripts_parsed", len(work))
+    new_entries = []
+    removed = []
+    sessions_processed = 0
+    try:
+        for (jf, session_id, st, cursor), result in zip(work, results):
+            if result is None:
+                continue
+            rows, resume, end_offset = result
+
+            cursors[session_id] = {
+                "ino": st.st_ino,
+                "size": st.st_size,
+                "mtime": st.st_mtime_ns,
+                "offset": end_offset,
+                "state": resume,
+            }
+            cursors_changed = True
+
+            if not rows:
+                continue
+            turn_entries = [row_to_entry(r) for r in rows]
+
+            if not cursor:
+                # Only transcripts without a trusted cursor need the store's
+                # view of the session, so incremental runs never read it
+                if existing is None:
+                    existing = store.session_index()
+                old_sessions, turns_per_session = existing
+                expected_count = len(turn_entries)
+                existing_count = turns_per_session.get(session_id, 0)
+
+                # If all turns already present and session not in old-format set, skip
+                if existing_count >= expected_count and session_id not in old_sessions:
+                    continue
 
-# Regenerate charts if we added anything
-if new_entries:
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    charts_html = os.path.join(tracking_dir, "charts.html")
-    os.system(f'python3 "{script_dir}/generate-charts.py" "{tokens_file}" "{charts_html}" 2>/dev/null')
+                # Old-format entries for this session are superseded by the per-turn ones
+                removed.extend(old_sessions.pop(session_id, []))
+
+            # Appending upserts by (session_id, turn_index); readers keep the newest
+            new_entries.extend(turn_entries)
+            sessions_processed += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    profiling.mark("write")
+    profiling.count("turns_written", len(new_entries))
+    if new_entries or removed:
+        # One commit: tombstones for superseded entries, then the new turns
+        store.append([tombstone(e) for e in removed] + new_entries)
+
+    return sessions_processed, new_entries, cursors_changed
+
+
+def main():
+    profiling.start("backfill")
+    args, jobs, regen_charts = parse_args(sys.argv[1:])
+
+    project_root = os.path.abspath(args[0])
+    project_name = os.path.basename(project_root)
+    tracking_dir = os.path.join(project_root, ".claude", "tracking")
+    tokens_file = os.path.join(tracking_dir, "tokens.json")
+    cursors_file = os.path.join(tracking_dir, "backfill-cursors.json")
+    store = open_store(tracking_dir)
+    profiling.set_tracking_dir(tracking_dir)
+    profiling.mark("scan")
+
+    # Claude Code slugifies project paths: replace "/" with "-"
+    slug = project_root.replace("/", "-")
+    transcripts_dir = os.path.expanduser("~/.claude/projects/" + slug)
+
+    if not args[1:] and not os.path.isdir(transcripts_dir):
+        print("No transcript directory found, nothing to backfill.")
+        sys.exit(0)
+
+    # Find all JSONL transcripts
+    if args[1:]:
+        jsonl_files = [os.path.abspath(a) for a in args[1:]]
+    else:
+        jsonl_files = list_transcripts(transcripts_dir)
+    cursors = load_cursors(cursors_file, store)
+    sessions_processed, new_entries, cursors_changed = backfill(
+        store, project_name, jsonl_files, cursors, jobs)
+
+    # Forget transcripts that have been deleted
+    forget = []
+    if not args[1:]:
+        seen_sessions = {session_id_of(jf) for jf in jsonl_files}
+        forget = [sid for sid in cursors if sid not in seen_sessions]
+        for sid in forget:
+            del cursors[sid]
+            cursors_changed = True
+
+    # Cursors are saved after the store so a failed write is simply redone next run
+    profiling.mark("cursors")
+    if cursors_changed:
+        save_cursors(cursors_file, store, cursors, forget)
+
+    total_turns = len(new_entries)
+    print(f"{sessions_processed} session{'s' if sessions_processed != 1 else ''} processed, {total_turns} turn{'s' if total_turns != 1 else ''} written.")
+
+    # Regenerate charts if we added anything
+    if new_entries and regen_charts:
+        profiling.mark("charts")
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        charts_html = os.path.join(tracking_dir, "charts.html")
+        os.system(f'python3 "{script_dir}/generate-charts.py" "{tokens_file}" "{charts_html}" 2>/dev/null')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic project for benchmarking the tracking scripts.
+
+Usage:
+  python3 generate.py <workdir> --turns N [--payload BYTES] [--seed S] [--no-tokens-json]
+
+Creates, under <workdir>:
+  home/.claude/projects/<slug>/*.jsonl   transcripts, shaped like Claude Code's
+                                         (compact JSON, tool_use/tool_result
+                                         rounds, sidechain and progress lines)
+  project/.git/                          so the scripts find a project root
+  project/.claude/tracking/tokens.json   the same turns as a legacy tokens.json
+                                         (~10% with duration 0, for patch-durations)
+  project/.claude/tracking/key-prompts/  one journal file per day
+
+Run the tracking scripts with HOME=<workdir>/home. N counts turns as the
+tracker does (a user message answered by an assistant message with usage).
+--payload is the mean tool-result size in bytes and dominates transcript size.
+"""
+import sys, os, json, random
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from transcripts import compute_turns
+
+MODELS = ("claude-opus-4-6", "claude-sonnet-4-5-20250929", "claude-haiku-4-5-20251001")
+TOOLS = ("Read", "Edit", "Bash", "Grep", "Glob", "Write")
+CATEGORIES = ("bug-resolution", "architecture", "feature", "breakthrough")
+TURNS_PER_DAY = 300
+START = datetime(2026, 1, 5, 9, 0, 0)
+
+
+def parse_size(s):
+    s = s.lower()
+    for suffix, mult in (("k", 1000), ("m", 1000000)):
+        if s.endswith(suffix):
+            return int(float(s[:-1]) * mult)
+    return int(s)
+
+
+def ts(t):
+    return t.strftime("%Y-%m-%dT%H:%M:%S.") + f"{t.microsecond // 1000:03d}Z"
+
+
+def dumps(obj):
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def write_session(f, rng, sid, model, t, n_turns, payload, cwd):
+    """Write one transcript of n_turns turns starting at t; return the
+    parsed msgs/usages (as parse_turns would) and the end time."""
+    msgs = []
+    usages = []
+    base = {"isSidechain": False, "userType": "external", "cwd": cwd,
+            "sessionId": sid, "version": "2.0.14", "gitBranch": "main"}
+    parent = None
+    done = 0
+    while done < n_turns:
+        # A human prompt followed by a few tool rounds; each round is a turn
+        rounds = min(n_turns - done, rng.randint(1, 12))
+        t += timedelta(seconds=rng.randint(20, 1800))
+        for r in range(rounds):
+            uid = "u%x" % rng.getrandbits(64)
+            if r == 0:
+                content = "please look at item %d and fix what is broken" % rng.randint(1, 10 ** 6)
+                line = dict(base, parentUuid=parent, type="user", uuid=uid, timestamp=ts(t),
+                            message={"role": "user", "content": content})
+            else:
+                size = max(16, int(rng.expovariate(1 / payload)))
+                line = dict(base, parentUuid=parent, type="user", uuid=uid, timestamp=ts(t),
+                            message={"role": "user", "content": [
+                                {"tool_use_id": "toolu_%x" % rng.getrandbits(48),
+                                 "type": "tool_result", "content": "x" * size}]},
+                            toolUseResult={"stdout": "y" * (size // 4), "stderr": "",
+                                           "interrupted": False})
+            f.write(dumps(line) + "\n")
+            msgs.append(("user", line["timestamp"]))
+            parent = uid
+
+            if rng.random() < 0.05:
+                # Subagent progress and sidechain chatter the tracker must ignore
+                f.write(dumps({"type": "progress", "timestamp": ts(t), "sessionId": sid,
+                               "data": {"message": {"type": "user", "message": {
+                                   "role": "user", "content": "subtask"}}}}) + "\n")
+                f.write(dumps(dict(base, isSidechain=True, type="user", timestamp=ts(t),
+                                   message={"role": "user", "content": "subtask"})) + "\n")
+
+            # Durations are skewed: most turns are seconds, a few run for minutes
+            t += timedelta(seconds=int(rng.lognormvariate(2.5, 1.2)) + 1)
+            usage = {"input_tokens": rng.randint(1, 60),
+                     "cache_creation_input_tokens": rng.randint(0, 20000),
+                     "cache_read_input_tokens": rng.randint(0, 150000),
+                     "output_tokens": rng.randint(5, 4000)}
+            aid = "a%x" % rng.getrandbits(64)
+            last = r == rounds - 1
+            content = ([{"type": "text", "text": "Done. " * rng.randint(1, 40)}] if last else
+                       [{"type": "tool_use", "id": "toolu_%x" % rng.getrandbits(48),
+                         "name": rng.choice(TOOLS), "input": {"file_path": cwd + "/src/mod.py"}}])
+            line = dict(base, parentUuid=parent, type="assistant", uuid=aid, timestamp=ts(t),
+                        message={"id": "msg_%x" % rng.getrandbits(48), "type": "message",
+                                 "role": "assistant", "model": model, "content": content,
+                                 "stop_reason": "end_turn" if last else "tool_use",
+                                 "usage": usage})
+            f.write(dumps(line) + "\n")
+            msgs.append(("assistant", line["timestamp"]))
+            usages.append(usage)
+            parent = aid
+            done += 1
+    return msgs, usages, t
+
+
+def generate(workdir, turns, payload=1500, seed=1, tokens_json=True):
+    rng = random.Random(seed)
+    home = os.path.join(workdir, "home")
+    project = os.path.join(workdir, "project")
+    tracking_dir = os.path.join(project, ".claude", "tracking")
+    prompts_dir = os.path.join(tracking_dir, "key-prompts")
+    transcripts_dir = os.path.join(home, ".claude", "projects", project.replace("/", "-"))
+    for d in (os.path.join(project, ".git"), prompts_dir, transcripts_dir):
+        os.makedirs(d, exist_ok=True)
+    project_name = os.path.basename(project)
+
+    entries = []
+    days = set()
+    t = START
+    n = 0
+    s = 0
+    while n < turns:
+        sid = "%08x-%04x-4%03x-8%03x-%012x" % (rng.getrandbits(32), rng.getrandbits(16),
+                                                rng.getrandbits(12), rng.getrandbits(12),
+                                                rng.getrandbits(48))
+        size = min(turns - n, max(1, int(rng.lognormvariate(3.5, 1.0))))
+        model = rng.choice(MODELS)
+        # Keep roughly TURNS_PER_DAY turns per calendar day
+        day = START + timedelta(days=n // TURNS_PER_DAY)
+        if t < day:
+            t = day
+        with open(os.path.join(transcripts_dir, sid + ".jsonl"), "w") as f:
+            msgs, usages, t = write_session(f, rng, sid, model, t, size, payload, project)
+        if tokens_json:
+            turn_entries, _ = compute_turns(msgs, usages, msgs[0][1], model, sid, project_name)
+            for e in turn_entries:
+                if rng.random() < 0.1:
+                    e["duration_seconds"] = 0
+                days.add(e["date"])
+            entries.extend(turn_entries)
+        else:
+            days.add(msgs[0][1][:10])
+        n += size
+        s += 1
+
+    if tokens_json:
+        with open(os.path.join(tracking_dir, "tokens.json"), "w") as f:
+            json.dump(entries, f, indent=2)
+
+    for d in sorted(days):
+        with open(os.path.join(prompts_dir, d + ".md"), "w") as f:
+            f.write(f"# Key Prompts — {d}\n\n")
+            for k in range(rng.randint(1, 6)):
+                f.write(f"## Prompt {k + 1} for {d}\n"
+                        f"**Category**: {rng.choice(CATEGORIES)}\n"
+                        f"**Context**: synthetic\n\n")
+
+    return {"home": home, "project": project, "tracking_dir": tracking_dir,
+            "transcripts_dir": transcripts_dir, "turns": n, "sessions": s,
+            "days": len(days)}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opts = {"--turns": "1k", "--payload": "1500", "--seed": "1"}
+    tokens_json = "--no-tokens-json" not in args
+    args = [a for a in args if a != "--no-tokens-json"]
+    positional = []
+    i = 0
+    while i < len(args):
+        if args[i] in opts and i + 1 < len(args):
+            opts[args[i]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    if not positional:
+        sys.exit(__doc__.strip())
+    info = generate(os.path.abspath(positional[0]), parse_size(opts["--turns"]),
+                    parse_size(opts["--payload"]), int(opts["--seed"]), tokens_json)
+    print(json.dumps(info, indent=2))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tracking scripts end to end on synthetic projects.
+
+Usage:
+  python3 run.py [--sizes 1k,10k,100k] [--payload BYTES] [--out results.json]
+                 [--workdir DIR] [--keep] [--compare baseline.json]
+
+For each size a project is generated with generate.py (transcripts plus a
+legacy tokens.json), then each step runs as a subprocess with HOME pointed at
+the synthetic home, in the order a real upgrade would see them:
+
+  cost-summary         cold: first summary over the legacy tokens.json
+  generate-charts      cold
+  patch-durations      patches the ~10% zero-duration turns from transcripts
+  backfill             cold: no cursors yet, every transcript is read
+  backfill-warm        nothing changed since the last run
+  backfill-one         one transcript grew by a turn, passed explicitly
+                       (what stop-hook.sh does after every response)
+  generate-charts-warm
+  cost-summary-warm
+  update-prompts-index
+
+Each step reports wall time, peak RSS of the child process and the size of
+what it produced, as JSON (stdout, or --out). Results carry the git commit
+so runs from different commits can be compared with --compare, which prints
+the per-step wall/RSS ratios against an earlier results file. Steps slower
+than the Stop hook's 30s timeout are flagged.
+
+1m turns writes several GB of transcripts at the default payload; use a
+smaller --payload for it.
+"""
+import sys, os, json, time, shutil, subprocess, tempfile, platform
+
+from generate import generate, parse_size
+
+TRACKING = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOOK_TIMEOUT = 30
+
+
+def tree_size(*paths):
+    total = 0
+    for p in paths:
+        if os.path.isfile(p):
+            total += os.path.getsize(p)
+        elif os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def run_step(cmd, env):
+    """Run cmd; return (wall seconds, peak RSS bytes, stdout bytes, exit code)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return wall, rss, len(out), proc.returncode
+
+
+def append_turn(jf):
+    """Append one answered prompt to a transcript, an hour after its last line."""
+    with open(jf, "rb") as f:
+        f.seek(max(0, os.path.getsize(jf) - 65536))
+        last = json.loads(f.read().splitlines()[-1])
+    t = last["timestamp"]
+    later = t[:11] + "%02d" % ((int(t[11:13]) + 1) % 24) + t[13:]
+    with open(jf, "a") as f:
+        f.write(json.dumps({"type": "user", "timestamp": later, "sessionId": last.get("sessionId"),
+                            "message": {"role": "user", "content": "one more thing"}},
+                           separators=(",", ":")) + "\n")
+        f.write(json.dumps({"type": "assistant", "timestamp": later,
+                            "message": {"role": "assistant", "model": "claude-sonnet-4-5-20250929",
+                                        "content": [{"type": "text", "text": "ok"}],
+                                        "usage": {"input_tokens": 3, "output_tokens": 10,
+                                                  "cache_creation_input_tokens": 0,
+                                                  "cache_read_input_tokens": 100}}},
+                           separators=(",", ":")) + "\n")
+
+
+def bench_size(label, turns, payload, workdir):
+    gen_start = time.perf_counter()
+    info = generate(workdir, turns, payload)
+    gen_wall = time.perf_counter() - gen_start
+
+    env = dict(os.environ, HOME=info["home"])
+    project = info["project"]
+    tracking_dir = info["tracking_dir"]
+    tokens_file = os.path.join(tracking_dir, "tokens.json")
+    charts = os.path.join(tracking_dir, "charts.html")
+    charts_outputs = [charts, os.path.join(tracking_dir, "charts-data.js")]
+    store_paths = [tokens_file, os.path.join(tracking_dir, "tokens"),
+                   os.path.join(tracking_dir, "tokens.db")]
+    tokens_json_bytes = tree_size(tokens_file)
+    transcripts = sorted(os.listdir(info["transcripts_dir"]))
+    last_transcript = os.path.join(info["transcripts_dir"], transcripts[-1])
+
+    def script(name, *args):
+        return [sys.executable, os.path.join(TRACKING, name)] + list(args)
+
+    steps = [
+        ("cost-summary", script("cost-summary.py", tokens_file), None),
+        ("generate-charts", script("generate-charts.py", tokens_file, charts), charts_outputs),
+        ("patch-durations", script("patch-durations.py", project), store_paths),
+        ("backfill", script("backfill.py", project, "--no-charts"), store_paths),
+        ("backfill-warm", script("backfill.py", project, "--no-charts"), store_paths),
+        ("backfill-one", script("backfill.py", project, "--no-charts", last_transcript), store_paths),
+        ("generate-charts-warm", script("generate-charts.py", tokens_file, charts), charts_outputs),
+        ("cost-summary-warm", script("cost-summary.py", tokens_file), None),
+        ("update-prompts-index", script("update-prompts-index.py", tracking_dir),
+         [os.path.join(tracking_dir, "key-prompts.md")]),
+    ]
+
+    results = {}
+    for name, cmd, outputs in steps:
+        if name == "backfill-one":
+            append_turn(last_transcript)
+        wall, rss, stdout_bytes, code = run_step(cmd, env)
+        results[name] = {
+            "wall_s": round(wall, 4),
+            "peak_rss_bytes": rss,
+            "output_bytes": tree_size(*outputs) if outputs else stdout_bytes,
+            "exit_code": code,
+            "over_hook_timeout": wall > HOOK_TIMEOUT,
+        }
+        print(f"  {label:>5} {name:<22} {wall:>9.3f}s {rss / 2 ** 20:>8.1f} MiB"
+              f"{'  EXIT ' + str(code) if code else ''}"
+              f"{'  > hook timeout' if wall > HOOK_TIMEOUT else ''}", file=sys.stderr)
+
+    return {
+        "size": label,
+        "turns": info["turns"],
+        "sessions": info["sessions"],
+        "days": info["days"],
+        "transcript_bytes": tree_size(info["transcripts_dir"]),
+        "tokens_json_bytes": tokens_json_bytes,
+        "generate_s": round(gen_wall, 4),
+        "steps": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "-C", TRACKING, "rev-parse", "HEAD"],
+                              capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(baseline, current):
+    old = {r["size"]: r for r in baseline.get("results", [])}
+    print(f"\nvs {(baseline.get('commit') or '?')[:10]}:", file=sys.stderr)
+    for r in current["results"]:
+        o = old.get(r["size"])
+        if not o:
+            continue
+        for name, s in r["steps"].items():
+            b = o["steps"].get(name)
+            if not b or not b["wall_s"]:
+                continue
+            print(f"  {r['size']:>5} {name:<22} wall x{s['wall_s'] / b['wall_s']:>6.2f}"
+                  f"   rss x{s['peak_rss_bytes'] / max(1, b['peak_rss_bytes']):>6.2f}",
+                  file=sys.stderr)
+
+
+def main():
+    args = sys.argv[1:]
+    opts = {"--sizes": "1k,10k,100k", "--payload": "1500", "--out": None,
+            "--workdir": None, "--compare": None}
+    keep = "--keep" in args
+    args = [a for a in args if a != "--keep"]
+    i = 0
+    while i < len(args):
+        if args[i] in opts and i + 1 < len(args):
+            opts[args[i]] = args[i + 1]
+            i += 2
+        else:
+            sys.exit(__doc__.strip())
+
+    root = opts["--workdir"] or tempfile.mkdtemp(prefix="tracking-bench-")
+    payload = parse_size(opts["--payload"])
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "payload": payload,
+        "results": [],
+    }
+    try:
+        for label in opts["--sizes"].split(","):
+            workdir = os.path.join(root, label)
+            shutil.rmtree(workdir, ignore_errors=True)
+            report["results"].append(bench_size(label, parse_size(label), payload, workdir))
+            if not keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        if not keep and not opts["--workdir"]:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if opts["--out"]:
+        with open(opts["--out"], "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if opts["--compare"]:
+        with open(opts["--compare"]) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
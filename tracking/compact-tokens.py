@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Compact the token store, optionally migrating it to another backend.
+
+Usage:
+  python3 compact-tokens.py <project_root>
+  python3 compact-tokens.py <project_root> --to sqlite|segments
+
+Segment store: folds <project_root>/.claude/tracking/tokens.json into the
+month segments under tokens/, drops superseded records and tombstones, and
+rewrites each segment sorted by (date, session_id, turn_index). Safe to run
+at any time; nothing is lost if it is never run, segments just carry stale
+records.
+
+SQLite store (tokens.db): folds in any leftover tokens.json/segments and
+VACUUMs.
+
+--to moves every live entry into the named backend and removes the old one.
+"""
+import sys, os
+
+from token_store import SqliteTokenStore, TokenStore, open_store, write_lock
+
+args = sys.argv[1:]
+target = None
+if "--to" in args:
+    i = args.index("--to")
+    target = args[i + 1] if i + 1 < len(args) else ""
+    del args[i:i + 2]
+    if target not in ("sqlite", "segments"):
+        sys.exit("--to must be 'sqlite' or 'segments'")
+
+project_root = os.path.abspath(args[0])
+tracking_dir = os.path.join(project_root, ".claude", "tracking")
+
+if not os.path.isdir(tracking_dir):
+    sys.exit(f"No tracking directory at {tracking_dir}")
+
+store = open_store(tracking_dir)
+current = "sqlite" if isinstance(store, SqliteTokenStore) else "segments"
+
+if target and target != current:
+    # Hold the write lock for the whole move so no hook writes to the old
+    # store in between
+    with write_lock(tracking_dir):
+        entries = store.load()
+        dest = SqliteTokenStore(tracking_dir) if target == "sqlite" else TokenStore(tracking_dir)
+        # Write the new store before removing the old one
+        dest.append(entries)
+        store.clear()
+    store = dest
+    print(f"Migrated {len(entries)} turn{'s' if len(entries) != 1 else ''} to {target}.")
+
+before, after = store.compact()
+print(f"{before} record{'s' if before != 1 else ''} compacted to {after} turn{'s' if after != 1 else ''}.")
@@ -1,16 +1,35 @@
 #!/usr/bin/env python3
 """
 Usage:
-  python3 cost-summary.py <tokens.json>
-  python3 cost-summary.py  (defaults to .claude/tracking/tokens.json in cwd's git root)
+  python3 cost-summary.py <tracking dir or its tokens.json>
+  python3 cost-summary.py  (defaults to the .claude/tracking store in cwd's git root)
   python3 cost-summary.py --chart  (open tracking charts in browser)
+  python3 cost-summary.py --all [--jobs N]  (every project under ~/.claude/projects)
+  --profile                 record phase timings in metrics.jsonl (see profiling.py)
+
+Filters (single project):
+  --since DAY --until DAY   inclusive; YYYY-MM-DD, today, yesterday, or Nd / Nw ago
+  --model TEXT              models whose id contains TEXT (e.g. opus)
+  --session PREFIX          session ids starting with PREFIX
+  --group-by hour|day|week|model|session
+
+--all merges the per-project rollups through the global index kept by
+global_rollup.py, so only projects with new turns are re-read.
+
+Filtered runs read only the requested date range from the store (whole
+months are skipped, the boundary ones bisected) and then bisect the loaded
+turns' day index, so a week's query costs a week's turns however long the
+history is. Dates and hours are UTC, as recorded.
 """
 import sys
-import json
 import os
 import webbrowser
-from collections import defaultdict
-from datetime import date
+from datetime import datetime, timedelta, timezone
+
+import profiling
+from token_store import LEGACY_FILE, SQLITE_FILE, TokenStore, open_store
+
+FILTERS = ("--since", "--until", "--model", "--session", "--group-by")
 
 def find_git_root():
     root = os.getcwd()
@@ -20,12 +39,23 @@ def find_git_root():
         root = os.path.dirname(root)
     return root
 
-def find_tokens_file():
-    root = find_git_root()
-    path = os.path.join(root, ".claude", "tracking", "tokens.json")
-    if os.path.exists(path):
+def default_tracking_dir():
+    return os.path.join(find_git_root(), ".claude", "tracking")
+
+def find_tracking_dir():
+    """The git root's tracking dir, if open_store() finds turns there:
+    segments, tokens.db or a legacy tokens.json."""
+    path = default_tracking_dir()
+    if (os.path.exists(os.path.join(path, SQLITE_FILE))
+            or os.path.exists(os.path.join(path, LEGACY_FILE))
+            or TokenStore(path).segment_months()):
         return path
-    sys.exit(f"No tokens.json found at {path}")
+    sys.exit(f"No token store found in {path}")
+
+def tracking_dir_of(path):
+    """A tracking dir given as itself or as its tokens.json."""
+    path = os.path.abspath(path)
+    return path if os.path.isdir(path) else os.path.dirname(path)
 
 def format_duration(seconds):
     if seconds <= 0:
@@ -37,74 +67,131 @@ def format_duration(seconds):
         return f"{h}h {m}m"
     return f"{m}m {s}s"
 
-if "--chart" in sys.argv:
-    chart = os.path.join(find_git_root(), ".claude", "tracking", "charts.html")
+def parse_day(value):
+    today = datetime.now(timezone.utc).date()
+    if value == "today":
+        return today.isoformat()
+    if value == "yesterday":
+        return (today - timedelta(days=1)).isoformat()
+    if value[:-1].isdigit() and value[-1:] in ("d", "w"):
+        days = int(value[:-1]) * (7 if value[-1] == "w" else 1)
+        return (today - timedelta(days=days)).isoformat()
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        sys.exit(f"Bad date {value!r}: use YYYY-MM-DD, today, yesterday, Nd or Nw")
+
+profiling.start("cost-summary")
+args = sys.argv[1:]
+opts = {}
+for flag in FILTERS + ("--jobs",):
+    if flag in args:
+        i = args.index(flag)
+        if i + 1 >= len(args):
+            sys.exit(f"{flag} needs a value")
+        opts[flag] = args[i + 1]
+        del args[i:i + 2]
+since = parse_day(opts["--since"]) if "--since" in opts else None
+until = parse_day(opts["--until"]) if "--until" in opts else None
+group_by = opts.get("--group-by")
+filtered = any(f in opts for f in FILTERS)
+
+paths = [a for a in args if not a.startswith("--")]
+
+if "--chart" in args:
+    chart = os.path.join(tracking_dir_of(paths[0]) if paths else default_tracking_dir(), "charts.html")
     if not os.path.exists(chart):
         sys.exit(f"No charts.html found at {chart} — run generate-charts.py first")
     webbrowser.open(f"file://{chart}")
     sys.exit(0)
 
-tokens_file = sys.argv[1] if len(sys.argv) > 1 else find_tokens_file()
-
-with open(tokens_file) as f:
-    data = json.load(f)
-
-if not data:
-    print("No sessions recorded yet.")
+grouped = None
+if "--all" in args:
+    from global_rollup import merge, refresh
+    if filtered:
+        sys.exit("Filters and --group-by are not supported with --all")
+    summary = merge(refresh(int(opts.get("--jobs", 8))))
+    title = f"all projects ({len(summary['by_project'])})"
+else:
+    tracking_dir = tracking_dir_of(paths[0]) if paths else find_tracking_dir()
+    store = open_store(tracking_dir)
+    profiling.set_tracking_dir(tracking_dir)
+    profiling.mark("load")
+    title = os.path.basename(os.path.dirname(tracking_dir))
+    if filtered:
+        from aggregate import GROUP_BY, TurnColumns, aggregate, group_turns, select, take
+        if group_by is not None and group_by not in GROUP_BY:
+            sys.exit(f"--group-by must be one of {', '.join(GROUP_BY)}")
+        cols = TurnColumns.from_store(store, since, until, hours=group_by == "hour")
+        cols = take(cols, select(cols, since, until, opts.get("--model"), opts.get("--session")))
+        summary = aggregate(cols)
+        if group_by:
+            grouped = group_turns(cols, group_by)
+        title += " — " + ", ".join(f"{f[2:]} {opts[f]}" for f in FILTERS if f in opts)
+    else:
+        # --- Aggregate ---
+        # Each entry is a turn. Sessions = unique session_ids. Prompts = total entries.
+        # The store computes every group-by in one pass (or one GROUP BY in SQLite).
+        summary = store.summary()
+by_date = summary["by_date"]
+by_model = summary["by_model"]
+totals = summary["totals"]
+
+total_turns = totals["turns"]
+if not total_turns:
+    print("No turns match." if filtered else "No sessions recorded yet.")
     sys.exit(0)
 
-# --- Aggregate ---
-# Each entry is a turn. Sessions = unique session_ids. Prompts = total entries.
-by_date = defaultdict(lambda: {"cost": 0, "prompts": 0, "output": 0, "cache_read": 0, "cache_create": 0, "input": 0, "duration": 0})
-by_model = defaultdict(lambda: {"cost": 0, "prompts": 0})
-total_cost = 0
-total_turns = len(data)
-total_sessions = len({e.get("session_id") for e in data})
-sessions_with_tokens = len({e.get("session_id") for e in data if e.get("total_tokens", 0) > 0})
-
-for e in data:
-    d = e.get("date", "unknown")
-    cost = e.get("estimated_cost_usd", 0)
-    model = e.get("model", "unknown")
-    short_model = model.split("-20")[0] if "-20" in model else model
-
-    by_date[d]["cost"] += cost
-    by_date[d]["prompts"] += 1
-    by_date[d]["output"] += e.get("output_tokens", 0)
-    by_date[d]["cache_read"] += e.get("cache_read_tokens", 0)
-    by_date[d]["cache_create"] += e.get("cache_creation_tokens", 0)
-    by_date[d]["input"] += e.get("input_tokens", 0)
-    by_date[d]["duration"] += e.get("duration_seconds", 0)
-
-    by_model[short_model]["cost"] += cost
-    by_model[short_model]["prompts"] += 1
-
-    total_cost += cost
-
-total_output = sum(e.get("output_tokens", 0) for e in data)
-total_cache_read = sum(e.get("cache_read_tokens", 0) for e in data)
-total_cache_create = sum(e.get("cache_creation_tokens", 0) for e in data)
-total_input = sum(e.get("input_tokens", 0) for e in data)
+total_cost = totals["cost"]
+total_sessions = summary["sessions"]
+sessions_with_tokens = summary["sessions_with_tokens"]
+total_output = totals["output"]
+total_cache_read = totals["cache_read"]
+total_cache_create = totals["cache_create"]
+total_input = totals["input"]
+total_duration = totals["duration"]
 
 # --- Print ---
+profiling.mark("print")
 W = 60
 print("=" * W)
-print(f"  Cost Summary — {os.path.basename(os.path.dirname(os.path.dirname(tokens_file)))}")
+print(f"  Cost Summary — {title}")
 print("=" * W)
 
-print(f"\nBy date:")
-print(f"  {'Date':<12} {'Prompts':>8} {'Output':>10} {'Cache Read':>12} {'Duration':>10} {'Cost':>10}")
-print(f"  {'-'*12} {'-'*8} {'-'*10} {'-'*12} {'-'*10} {'-'*10}")
-for d in sorted(by_date):
-    r = by_date[d]
-    print(f"  {d:<12} {r['prompts']:>8} {r['output']:>10,} {r['cache_read']:>12,} {format_duration(r['duration']):>10} ${r['cost']:>9.2f}")
-
-print(f"\nBy model:")
-print(f"  {'Model':<30} {'Prompts':>8} {'Cost':>10}")
-print(f"  {'-'*30} {'-'*8} {'-'*10}")
-for m in sorted(by_model, key=lambda x: -by_model[x]["cost"]):
-    r = by_model[m]
-    print(f"  {m:<30} {r['prompts']:>8} ${r['cost']:>9.2f}")
+if grouped is not None:
+    k = max(12, max(len(key) for key in grouped))
+    order = sorted(grouped) if group_by in ("hour", "day", "week") else \
+        sorted(grouped, key=lambda x: -grouped[x]["cost"])
+    print(f"\nBy {group_by}:")
+    print(f"  {group_by.capitalize():<{k}} {'Sessions':>8} {'Prompts':>8} {'Output':>10} {'Cache Read':>12} {'Duration':>10} {'Cost':>10}")
+    print(f"  {'-'*k} {'-'*8} {'-'*8} {'-'*10} {'-'*12} {'-'*10} {'-'*10}")
+    for key in order:
+        r = grouped[key]
+        print(f"  {key:<{k}} {r['sessions']:>8} {r['turns']:>8} {r['output']:>10,} {r['cache_read']:>12,} {format_duration(r['duration']):>10} ${r['cost']:>9.2f}")
+else:
+    print(f"\nBy date:")
+    print(f"  {'Date':<12} {'Prompts':>8} {'Output':>10} {'Cache Read':>12} {'Duration':>10} {'Cost':>10}")
+    print(f"  {'-'*12} {'-'*8} {'-'*10} {'-'*12} {'-'*10} {'-'*10}")
+    for d in sorted(by_date):
+        r = by_date[d]
+        print(f"  {d:<12} {r['turns']:>8} {r['output']:>10,} {r['cache_read']:>12,} {format_duration(r['duration']):>10} ${r['cost']:>9.2f}")
+
+if group_by != "model":
+    print(f"\nBy model:")
+    print(f"  {'Model':<30} {'Prompts':>8} {'Cost':>10}")
+    print(f"  {'-'*30} {'-'*8} {'-'*10}")
+    for m in sorted(by_model, key=lambda x: -by_model[x]["cost"]):
+        r = by_model[m]
+        print(f"  {m:<30} {r['turns']:>8} ${r['cost']:>9.2f}")
+
+if "by_project" in summary:
+    by_project = summary["by_project"]
+    print(f"\nBy project:")
+    print(f"  {'Project':<30} {'Sessions':>8} {'Prompts':>8} {'Cost':>10}")
+    print(f"  {'-'*30} {'-'*8} {'-'*8} {'-'*10}")
+    for root in sorted(by_project, key=lambda r: -by_project[r]["cost"]):
+        r = by_project[root]
+        print(f"  {os.path.basename(root):<30} {r['sessions']:>8} {r['turns']:>8} ${r['cost']:>9.2f}")
 
 print(f"\nTotals:")
 print(f"  Sessions:          {total_sessions:>8}  ({sessions_with_tokens} with token data)")
@@ -113,7 +200,6 @@ print(f"  Input tokens:      {total_input:>12,}")
 print(f"  Cache write:       {total_cache_create:>12,}")
 print(f"  Cache read:        {total_cache_read:>12,}")
 print(f"  Output tokens:     {total_output:>12,}")
-total_duration = sum(e.get("duration_seconds", 0) for e in data)
 print(f"  Active time:       {format_duration(total_duration):>12}")
 print(f"  Estimated cost:    ${total_cost:>11.2f}")
 
@@ -3,13 +3,56 @@
 Generates tracking/charts.html from tokens.json + key-prompts/ folder.
 Called by stop-hook.sh after each session update.
 
-Usage: python3 generate-charts.py <tokens.json> <output.html>
+Usage: python3 generate-charts.py <tokens.json> <output.html> [--points N] [--profile]
+       python3 generate-charts.py --all <output.html>
+
+--all charts every tracked project under ~/.claude/projects from the merged
+rollup index (see global_rollup.py). The index has no individual turns, so
+the cumulative lines run per day and the per-turn scatters are empty.
+
+Per-turn series are capped at a point budget (--points, or
+$CLAUDE_CHART_POINTS, default 2000). Above it the cumulative lines are
+downsampled with LTTB and the scatters are binned into density points; the
+full-resolution series go to a sidecar, <output>-data.js, that the page loads
+the first time one of those charts is zoomed.
+
+When the tracking directory has a metrics.jsonl (runs made with --profile,
+see profiling.py), a "Tracker performance" panel charts the phase timings
+of the latest runs.
 """
-import sys, json, os, re, glob
+import sys, json, os
+import datetime
 from collections import defaultdict
-
-tokens_file = sys.argv[1]
-output_file = sys.argv[2]
+from itertools import accumulate
+from math import log1p
+
+import profiling
+from aggregate import TurnColumns, aggregate
+from key_prompts import load as load_prompts
+from token_store import DURATION_EDGES, open_store, short_model
+from transcripts import (count_human_messages, is_archived, list_transcripts, read_sidecar,
+                         session_id_of)
+
+profiling.start("generate-charts")
+args = sys.argv[1:]
+point_budget = int(os.environ.get("CLAUDE_CHART_POINTS") or 2000)
+if "--points" in args:
+    i = args.index("--points")
+    point_budget = int(args[i + 1])
+    del args[i:i + 2]
+point_budget = max(point_budget, 10)
+global_mode = "--all" in args
+if global_mode:
+    args.remove("--all")
+    tokens_file = None
+    output_file = args[0]
+else:
+    tokens_file = args[0]
+    output_file = args[1]
+sidecar_file = os.path.splitext(output_file)[0] + "-data.js"
+tracking_dir = None if global_mode else os.path.dirname(os.path.abspath(tokens_file))
+profiling.set_tracking_dir(tracking_dir)
+profiling.mark("load")
 
 def format_duration(seconds):
     if seconds <= 0:
@@ -21,153 +64,241 @@ def format_duration(seconds):
         return f"{h}h {m}m"
     return f"{m}m {s}s"
 
-with open(tokens_file) as f:
-    data = json.load(f)
-
-if not data:
+def lttb(ys, budget):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps when
+    reducing the series ys (x = index) to budget points."""
+    n = len(ys)
+    if n <= budget or budget < 3:
+        return list(range(n))
+    every = (n - 2) / (budget - 2)
+    keep = [0]
+    a = 0
+    for i in range(budget - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end < next_end:
+            avg_x = (end + next_end - 1) / 2
+            avg_y = sum(ys[end:next_end]) / (next_end - end)
+        else:
+            avg_x, avg_y = n - 1, ys[n - 1]
+        ay = ys[a]
+        best = -1
+        pick = start
+        for j in range(start, end):
+            area = abs((a - avg_x) * (ys[j] - ay) - (a - j) * (avg_y - ay))
+            if area > best:
+                best = area
+                pick = j
+        keep.append(pick)
+        a = pick
+    keep.append(n - 1)
+    return keep
+
+
+def bin_points(points, budget, y_digits):
+    """Reduce (x, y, label) points to at most ~budget density points: one per
+    occupied cell of a log-spaced grid, at the cell's mean, with its count."""
+    side = max(1, int(budget ** 0.5))
+    max_x = log1p(max(p[0] for p in points)) or 1
+    max_y = log1p(max(max(p[1], 0) for p in points)) or 1
+    cells = {}
+    for x, y, _ in points:
+        key = (min(side - 1, int(log1p(x) / max_x * side)),
+               min(side - 1, int(log1p(max(y, 0)) / max_y * side)))
+        c = cells.get(key)
+        if c is None:
+            cells[key] = [x, y, 1]
+        else:
+            c[0] += x
+            c[1] += y
+            c[2] += 1
+    return [{"x": round(sx / n), "y": round(sy / n, y_digits),
+             "label": f"{n} prompt{'s' if n != 1 else ''} (mean)", "n": n}
+            for sx, sy, n in cells.values()]
+
+
+if global_mode:
+    from global_rollup import merge, refresh
+    projects = refresh()
+    summary = merge(projects)
+    cols = TurnColumns()
+else:
+    store = open_store(tracking_dir)
+    # Turns are read once into columns; every aggregate below comes from the
+    # single pass in aggregate()
+    cols = TurnColumns.from_store(store)
+    summary = aggregate(cols)
+if not summary["totals"]["turns"]:
     sys.exit(0)
 
 # --- Aggregate by date ---
-# Each entry is a turn; group by date for bar charts, session_id for unique session count
 by_date = defaultdict(lambda: {"cost": 0, "turns": 0, "output": 0,
                                 "cache_read": 0, "cache_create": 0, "input": 0,
                                 "opus_cost": 0, "sonnet_cost": 0, "duration": 0})
 by_model = defaultdict(lambda: {"cost": 0, "turns": 0})
-cumulative = []
-
-running_cost = 0
-running_duration = 0
-sort_key = lambda x: (x.get("date", ""), x.get("session_id", ""), x.get("turn_index", 0))
-for e in sorted(data, key=sort_key):
-    d = e.get("date", "unknown")
-    cost = e.get("estimated_cost_usd", 0)
-    model = e.get("model", "unknown")
-    short = model.split("-20")[0] if "-20" in model else model
-
-    by_date[d]["cost"] += cost
-    by_date[d]["turns"] += 1
-    by_date[d]["output"] += e.get("output_tokens", 0)
-    by_date[d]["cache_read"] += e.get("cache_read_tokens", 0)
-    by_date[d]["cache_create"] += e.get("cache_creation_tokens", 0)
-    by_date[d]["input"] += e.get("input_tokens", 0)
+duration_buckets = [0] * (len(DURATION_EDGES) + 1)
+
+for (d, model), r in sorted(summary["groups"].items()):
+    short = short_model(model)
+    for k in ("cost", "turns", "output", "cache_read", "cache_create", "input", "duration"):
+        by_date[d][k] += r[k]
     if "opus" in model:
-        by_date[d]["opus_cost"] += cost
+        by_date[d]["opus_cost"] += r["cost"]
     else:
-        by_date[d]["sonnet_cost"] += cost
-    by_date[d]["duration"] += e.get("duration_seconds", 0)
+        by_date[d]["sonnet_cost"] += r["cost"]
 
-    by_model[short]["cost"] += cost
-    by_model[short]["turns"] += 1
+    by_model[short]["cost"] += r["cost"]
+    by_model[short]["turns"] += r["turns"]
 
-    running_cost += cost
-    running_duration += e.get("duration_seconds", 0)
-    cumulative.append({"date": d, "cumulative_cost": round(running_cost, 4),
-                        "cumulative_duration": round(running_duration),
-                        "session_id": e.get("session_id", "")[:8],
-                        "turn_index": e.get("turn_index", 0)})
+    for i in range(len(duration_buckets)):
+        duration_buckets[i] += r[f"h{i}"]
 
+totals = summary["totals"]
 dates = sorted(by_date.keys())
-total_cost = sum(e.get("estimated_cost_usd", 0) for e in data)
-total_turns = len(data)
-total_sessions = len({e.get("session_id") for e in data})
-sessions_with_data = len({e.get("session_id") for e in data if e.get("total_tokens", 0) > 0})
-total_output = sum(e.get("output_tokens", 0) for e in data)
-total_cache_read = sum(e.get("cache_read_tokens", 0) for e in data)
-total_all_tokens = sum(e.get("total_tokens", 0) for e in data)
+total_cost = totals["cost"]
+total_turns = totals["turns"]
+total_sessions = summary["sessions"]
+sessions_with_data = summary["sessions_with_tokens"]
+total_output = totals["output"]
+total_cache_read = totals["cache_read"]
+total_all_tokens = totals["total"]
 cache_pct = round(total_cache_read / total_all_tokens * 100, 1) if total_all_tokens > 0 else 0
-total_duration = sum(e.get("duration_seconds", 0) for e in data)
+total_duration = totals["duration"]
 avg_duration = total_duration // total_turns if total_turns > 0 else 0
 
-project_name = data[0].get("project", "Project") if data else "Project"
+# --- Per-turn series ---
+if global_mode:
+    project_name = f"all projects ({len(projects)})"
+    # The merged index has daily rollups only, so the lines run per day
+    turn_labels = list(dates)
+    cum_cost = list(accumulate(by_date[d]["cost"] for d in dates))
+    cum_duration = list(accumulate(by_date[d]["duration"] for d in dates))
+else:
+    project_name = cols.project or "Project"
+    cum_cost = summary["cumulative_cost"]
+    cum_duration = summary["cumulative_duration"]
+    turn_labels = [f"{cols.dates[d]} {cols.sessions[s][:8]}#{t}"
+                   for d, s, t in zip(cols.date, cols.session, cols.turn_index)]
+
+scatter_points = []
+tpm_points = []
+for d, s, t, dur, cost, out in zip(cols.date, cols.session, cols.turn_index,
+                                   cols.duration, cols.cost, cols.output):
+    if dur > 0:
+        label = f"{cols.dates[d]} {cols.sessions[s][:6]}#{t}"
+        scatter_points.append((dur, round(cost, 4), label))
+        if out > 0:
+            tpm_points.append((dur, round(out / (dur / 60), 1), label))
+
+# Large histories: keep the page light and put full resolution in the sidecar
+downsampled = max(len(turn_labels), len(scatter_points), len(tpm_points)) > point_budget
+if downsampled:
+    tmp = f"{sidecar_file}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write("window.CHARTS_FULL = ")
+        json.dump({"labels": turn_labels,
+                   "cost": [round(c, 4) for c in cum_cost],
+                   "duration": list(cum_duration),
+                   "scatter": scatter_points,
+                   "tpm": tpm_points}, f, separators=(",", ":"))
+        f.write(";\n")
+    os.replace(tmp, sidecar_file)
+elif os.path.exists(sidecar_file):
+    os.remove(sidecar_file)
 
 # --- Count total human messages per date from JSONL transcripts ---
-project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(tokens_file))))  # project root
-# Claude Code slugifies paths as: replace every "/" with "-" (keeping leading slash → leading dash)
-transcripts_dir = os.path.expanduser(
-    "~/.claude/projects/" + project_dir.replace("/", "-")
-)
+profiling.mark("transcripts")
+transcripts_dir = None
+if not global_mode:
+    project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(tokens_file))))  # project root
+    # Claude Code slugifies paths as: replace every "/" with "-" (keeping leading slash → leading dash)
+    transcripts_dir = os.path.expanduser(
+        "~/.claude/projects/" + project_dir.replace("/", "-")
+    )
 human_by_date = defaultdict(int)
 trivial_by_date = defaultdict(int)
 
-def _is_trivial(text):
-    return len(text) < 40 and "?" not in text
-
-if os.path.isdir(transcripts_dir):
-    for jf in glob.glob(os.path.join(transcripts_dir, "*.jsonl")):
-        # Use session date from tokens.json if available, else file mtime
-        sid = os.path.splitext(os.path.basename(jf))[0]
-        session_date = None
-        for e in data:
-            if e.get("session_id") == sid:
-                session_date = e.get("date")
-                break
-        if not session_date:
-            import datetime
-            session_date = datetime.datetime.fromtimestamp(
-                os.path.getmtime(jf)).strftime("%Y-%m-%d")
-
+if transcripts_dir and os.path.isdir(transcripts_dir):
+    # Per-transcript counts are cached by (size, mtime); only new or grown
+    # transcripts are read, and grown ones only from where the last run stopped
+    cache_file = os.path.join(os.path.dirname(os.path.abspath(tokens_file)), "human-messages-cache.json")
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except Exception:
+        cache = {}
+    cache_changed = False
+    fresh = {}
+    session_dates = summary["session_dates"]
+
+    for jf in list_transcripts(transcripts_dir):
         try:
-            with open(jf) as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                        # Human messages have type="user" and userType="human" at the top level
-                        if obj.get("type") != "user":
-                            continue
-                        if obj.get("userType") not in ("human", "external", None):
-                            continue
-                        if obj.get("isSidechain"):
-                            continue
-                        content = obj.get("message", {}).get("content", "")
-                        if isinstance(content, list):
-                            # Skip pure tool-result messages
-                            texts = [
-                                c.get("text", "") for c in content
-                                if isinstance(c, dict) and c.get("type") == "text"
-                                and not str(c.get("text", "")).strip().startswith("<")
-                            ]
-                            if texts:
-                                text = " ".join(texts).strip()
-                                human_by_date[session_date] += 1
-                                if _is_trivial(text):
-                                    trivial_by_date[session_date] += 1
-                        elif isinstance(content, str):
-                            text = content.strip()
-                            # Skip slash commands and empty
-                            if text and not text.startswith("<") and not text.startswith("/"):
-                                human_by_date[session_date] += 1
-                                if _is_trivial(text):
-                                    trivial_by_date[session_date] += 1
-                    except:
-                        pass
-        except:
-            pass
+            st = os.stat(jf)
+        except OSError:
+            continue
+        c = cache.get(jf)
+        if not c or c.get("size") != st.st_size or c.get("mtime") != st.st_mtime_ns:
+            sidecar = read_sidecar(jf)
+            if sidecar is not None and "human" in sidecar:
+                # Archived: the counts were taken when it was compressed
+                human, trivial, offset = sidecar["human"], sidecar["trivial"], 0
+            elif c and c.get("ino") == st.st_ino and c.get("offset", 0) < st.st_size and not is_archived(jf):
+                human, trivial, offset = count_human_messages(jf, c["offset"])
+                human += c["human"]
+                trivial += c["trivial"]
+            else:
+                human, trivial, offset = count_human_messages(jf)
+            c = {"ino": st.st_ino, "size": st.st_size, "mtime": st.st_mtime_ns,
+                 "offset": offset, "human": human, "trivial": trivial}
+            cache_changed = True
+        fresh[jf] = c
+
+        # Use session date from the token store if available, else file mtime
+        sid = session_id_of(jf)
+        session_date = session_dates.get(sid)
+        if not session_date or session_date == "unknown":
+            session_date = datetime.datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d")
+        if c["human"]:
+            human_by_date[session_date] += c["human"]
+        if c["trivial"]:
+            trivial_by_date[session_date] += c["trivial"]
+
+    if cache_changed or len(fresh) != len(cache):
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(fresh, f)
+        os.replace(tmp, cache_file)
 
 total_human_msgs = sum(human_by_date.values())
 total_trivial_msgs = sum(trivial_by_date.values())
 
 # --- Aggregate prompt data from key-prompts/ folder ---
-prompts_dir = os.path.join(os.path.dirname(tokens_file), "key-prompts")
-prompt_files = sorted(glob.glob(os.path.join(prompts_dir, "????-??-??.md")))
+profiling.mark("prompts")
+if global_mode:
+    prompt_tracking_dirs = [os.path.join(root, ".claude", "tracking") for root in projects]
+else:
+    prompt_tracking_dirs = [tracking_dir]
 
 prompt_by_date = {}   # date -> {total, by_category}
 all_categories = set()
 
-for f in prompt_files:
-    date = os.path.splitext(os.path.basename(f))[0]
-    content = open(f).read()
-    cats = re.findall(r'^\*\*Category\*\*: (\S+)', content, re.MULTILINE)
-    by_cat = defaultdict(int)
-    for c in cats:
-        by_cat[c] += 1
-        all_categories.add(c)
-    prompt_by_date[date] = {"total": len(cats), "by_category": dict(by_cat)}
+# Per-file category counts come from the cache update-prompts-index.py keeps
+for d in prompt_tracking_dirs:
+    for date, meta in load_prompts(d).items():
+        # Several projects can have a journal for the same day
+        p = prompt_by_date.setdefault(date, {"total": 0, "by_category": {}})
+        for c, n in meta["categories"].items():
+            p["total"] += n
+            p["by_category"][c] = p["by_category"].get(c, 0) + n
+            all_categories.add(c)
 
 all_categories = sorted(all_categories)
 prompt_dates = sorted(prompt_by_date.keys())
 total_prompts = sum(v["total"] for v in prompt_by_date.values())
 
 # Build JS data structures
+profiling.mark("render")
 dates_js = json.dumps(dates)
 cost_by_date_js = json.dumps([round(by_date[d]["cost"], 4) for d in dates])
 sessions_by_date_js = json.dumps([by_date[d]["turns"] for d in dates])
@@ -177,9 +308,14 @@ opus_by_date_js = json.dumps([round(by_date[d]["opus_cost"], 4) for d in dates])
 sonnet_by_date_js = json.dumps([round(by_date[d]["sonnet_cost"], 4) for d in dates])
 duration_by_date_js = json.dumps([by_date[d]["duration"] for d in dates])
 
-cumul_labels_js = json.dumps([f"{c['date']} {c['session_id']}#{c['turn_index']}" for c in cumulative])
-cumul_values_js = json.dumps([c["cumulative_cost"] for c in cumulative])
-cumul_duration_js = json.dumps([c["cumulative_duration"] for c in cumulative])
+cost_keep = lttb(cum_cost, point_budget)
+duration_keep = lttb(cum_duration, point_budget)
+cumul_labels_js = json.dumps([turn_labels[i] for i in cost_keep])
+cumul_values_js = json.dumps([round(cum_cost[i], 4) for i in cost_keep])
+# The two lines share labels unless downsampling kept different turns
+cumul_time_labels_js = ("CUMUL_LABELS" if duration_keep == cost_keep
+                        else json.dumps([turn_labels[i] for i in duration_keep]))
+cumul_duration_js = json.dumps([cum_duration[i] for i in duration_keep])
 
 avg_duration_by_date_js = json.dumps([
     round(by_date[d]["duration"] / by_date[d]["turns"])
@@ -187,22 +323,15 @@ avg_duration_by_date_js = json.dumps([
     for d in dates
 ])
 
-scatter_data_js = json.dumps([
-    {"x": e.get("duration_seconds", 0),
-     "y": round(e.get("estimated_cost_usd", 0), 4),
-     "label": f"{e.get('date', '')} {e.get('session_id', '')[:6]}#{e.get('turn_index', 0)}"}
-    for e in sorted(data, key=sort_key)
-    if e.get("duration_seconds", 0) > 0
-])
+def scatter_js(points, y_digits):
+    if len(points) > point_budget:
+        return json.dumps(bin_points(points, point_budget, y_digits))
+    return json.dumps([{"x": x, "y": y, "label": label} for x, y, label in points])
+
+scatter_data_js = scatter_js(scatter_points, 4)
 
 # Tokens per minute per turn (output tokens / duration in minutes)
-tpm_data_js = json.dumps([
-    {"x": e.get("duration_seconds", 0),
-     "y": round(e.get("output_tokens", 0) / (e["duration_seconds"] / 60), 1),
-     "label": f"{e.get('date', '')} {e.get('session_id', '')[:6]}#{e.get('turn_index', 0)}"}
-    for e in sorted(data, key=sort_key)
-    if e.get("duration_seconds", 0) > 0 and e.get("output_tokens", 0) > 0
-])
+tpm_data_js = scatter_js(tpm_points, 1)
 
 # Prompt length histogram: bucket turns by duration across multiple ranges
 _dur_ranges = {
@@ -216,15 +345,16 @@ _dur_ranges = {
             ("30–40m", 1800, 2400), ("40–50m", 2400, 3000), ("50–60m", 3000, 3600), ("60m+", 3600, None)],
 }
 _dur_all = {}
+_edges = (0,) + DURATION_EDGES
 for rkey, buckets in _dur_ranges.items():
+    # Every range edge is one of DURATION_EDGES, so each bar is a sum of
+    # whole rollup buckets
     counts = {label: 0 for label, _, _ in buckets}
-    for e in data:
-        d = e.get("duration_seconds", 0)
-        if d <= 0:
-            continue
-        for label, lo, hi in buckets:
-            if hi is None or d < hi:
-                counts[label] += 1
+    for i, n in enumerate(duration_buckets):
+        lo = _edges[i]
+        for label, blo, hi in buckets:
+            if blo <= lo and (hi is None or lo < hi):
+                counts[label] += n
                 break
     _dur_all[rkey] = {
         "labels": [b[0] for b in buckets],
@@ -285,13 +415,236 @@ donut_labels_js = json.dumps(list(cat_totals.keys()))
 donut_values_js = json.dumps(list(cat_totals.values()))
 donut_colors_js = json.dumps([CAT_COLORS.get(c, DEFAULT_COLOR) for c in cat_totals])
 
+# Zoom support, only emitted when the page was downsampled: the first zoom on
+# a per-turn chart loads the sidecar and redraws the visible range from it
+zoom_plugin_tag = ""
+zoom_js = ""
+if downsampled:
+    zoom_plugin_tag = ('\n<script src="https://cdn.jsdelivr.net/npm/'
+                       'chartjs-plugin-zoom@2.0.1/dist/chartjs-plugin-zoom.min.js"></script>')
+    zoom_js = """
+// Downsampled per-turn charts: zoom (wheel, or shift+drag) loads the
+// full-resolution sidecar and redraws the visible range; double-click resets
+(function() {
+  const POINT_BUDGET = __BUDGET__;
+  const SIDECAR = __SIDECAR__;
+  const KEEP = { cost: __COST_KEEP__, duration: __DURATION_KEEP__ };
+  if (window.ChartZoom) Chart.register(window.ChartZoom);
+
+  let full = null;
+  const waiting = [];
+  function withFull(cb) {
+    if (full) return cb(full);
+    waiting.push(cb);
+    if (waiting.length > 1) return;
+    const s = document.createElement('script');
+    s.src = SIDECAR;
+    s.onload = () => { full = window.CHARTS_FULL; waiting.splice(0).forEach(f => f(full)); };
+    s.onerror = () => { waiting.length = 0; };
+    document.head.appendChild(s);
+  }
+
+  // Largest-Triangle-Three-Buckets over ys[lo..hi], as indices into ys
+  function lttb(ys, lo, hi, budget) {
+    const n = hi - lo + 1;
+    const keep = [];
+    if (n <= budget) {
+      for (let i = lo; i <= hi; i++) keep.push(i);
+      return keep;
+    }
+    const every = (n - 2) / (budget - 2);
+    let a = lo;
+    keep.push(lo);
+    for (let i = 0; i < budget - 2; i++) {
+      const start = lo + Math.floor(i * every) + 1;
+      const end = lo + Math.floor((i + 1) * every) + 1;
+      const nextEnd = Math.min(lo + Math.floor((i + 2) * every) + 1, hi + 1);
+      let avgX = hi, avgY = ys[hi];
+      if (end < nextEnd) {
+        avgX = (end + nextEnd - 1) / 2;
+        avgY = 0;
+        for (let j = end; j < nextEnd; j++) avgY += ys[j];
+        avgY /= nextEnd - end;
+      }
+      let best = -1, pick = start;
+      for (let j = start; j < end; j++) {
+        const area = Math.abs((a - avgX) * (ys[j] - ys[a]) - (a - j) * (avgY - ys[a]));
+        if (area > best) { best = area; pick = j; }
+      }
+      keep.push(pick);
+      a = pick;
+    }
+    keep.push(hi);
+    return keep;
+  }
+
+  // One point per occupied cell of a log-spaced grid, at the cell mean
+  function binPoints(points, budget, digits) {
+    const side = Math.max(1, Math.floor(Math.sqrt(budget)));
+    let maxX = 0, maxY = 0;
+    for (const p of points) { maxX = Math.max(maxX, p[0]); maxY = Math.max(maxY, p[1]); }
+    maxX = Math.log1p(maxX) || 1;
+    maxY = Math.log1p(maxY) || 1;
+    const cells = new Map();
+    for (const p of points) {
+      const key = Math.min(side - 1, Math.floor(Math.log1p(p[0]) / maxX * side)) * side
+                + Math.min(side - 1, Math.floor(Math.log1p(Math.max(p[1], 0)) / maxY * side));
+      const c = cells.get(key);
+      if (c) { c[0] += p[0]; c[1] += p[1]; c[2] += 1; }
+      else cells.set(key, [p[0], p[1], 1]);
+    }
+    const scale = Math.pow(10, digits);
+    return [...cells.values()].map(([sx, sy, n]) => ({
+      x: Math.round(sx / n), y: Math.round(sy / n * scale) / scale,
+      label: n + (n === 1 ? ' prompt' : ' prompts') + ' (mean)', n: n }));
+  }
+
+  function zoomable(chart, mode, onZoom, onReset) {
+    chart.config.options.plugins.zoom = {
+      zoom: { wheel: { enabled: true }, drag: { enabled: true, modifierKey: 'shift' },
+              mode: mode, onZoomComplete: ({ chart }) => withFull(f => onZoom(chart, f)) }
+    };
+    chart.canvas.addEventListener('dblclick', () => {
+      if (chart.resetZoom) chart.resetZoom('none');
+      onReset();
+      chart.update('none');
+    });
+    const h2 = chart.canvas.parentNode.querySelector('h2');
+    if (h2) h2.insertAdjacentHTML('beforeend',
+      ' <span style="text-transform:none;color:#64748b">· scroll to zoom</span>');
+    chart.update();
+  }
+
+  function zoomLine(id, key) {
+    const chart = Chart.getChart(id);
+    const ds = chart.data.datasets[0];
+    const base = { labels: chart.data.labels, data: ds.data };
+    let view = KEEP[key];   // index into the full series of each shown point
+    zoomable(chart, 'x', (chart, f) => {
+      const x = chart.config.options.scales.x;
+      const lo = view[Math.max(0, Math.floor(chart.scales.x.min))];
+      const hi = view[Math.min(view.length - 1, Math.ceil(chart.scales.x.max))];
+      const ys = f[key];
+      view = lttb(ys, lo, hi, POINT_BUDGET);
+      chart.data.labels = view.map(i => f.labels[i]);
+      ds.data = view.map(i => ys[i]);
+      delete x.min;
+      delete x.max;
+      chart.update('none');
+    }, () => {
+      view = KEEP[key];
+      chart.data.labels = base.labels;
+      ds.data = base.data;
+    });
+  }
+
+  function zoomScatter(id, key, digits) {
+    const chart = Chart.getChart(id);
+    const ds = chart.data.datasets[0];
+    const base = ds.data;
+    ds.pointRadius = ctx => ctx.raw && ctx.raw.n ? Math.min(12, 3 + Math.log2(ctx.raw.n)) : 5;
+    zoomable(chart, 'xy', (chart, f) => {
+      const sx = chart.scales.x, sy = chart.scales.y;
+      const pts = f[key].filter(p => p[0] >= sx.min && p[0] <= sx.max && p[1] >= sy.min && p[1] <= sy.max);
+      ds.data = pts.length > POINT_BUDGET ? binPoints(pts, POINT_BUDGET, digits)
+        : pts.map(p => ({ x: p[0], y: p[1], label: p[2] }));
+      chart.update('none');
+    }, () => { ds.data = base; });
+  }
+
+  zoomLine('cumul', 'cost');
+  zoomLine('cumulTime', 'duration');
+  zoomScatter('timeVsCost', 'scatter', 4);
+  zoomScatter('tokensPerMin', 'tpm', 1);
+})();
+"""
+    zoom_js = (zoom_js.replace("__BUDGET__", str(point_budget))
+               .replace("__SIDECAR__", json.dumps(os.path.basename(sidecar_file)))
+               .replace("__COST_KEEP__", json.dumps(cost_keep))
+               .replace("__DURATION_KEEP__", json.dumps(duration_keep)))
+
+# Tracker performance, only emitted when profiled runs left metrics behind
+perf_section = ""
+perf_js = ""
+metrics = profiling.load_metrics(tracking_dir) if tracking_dir else []
+if metrics:
+    runs = metrics[-50:]
+    phase_names = list(dict.fromkeys(k for r in runs for k in r.get("phases", {})))
+    palette = ["#64748b", "#6366f1", "#34d399", "#f59e0b", "#f472b6", "#38bdf8", "#a78bfa", "#f87171"]
+
+    def run_label(r):
+        try:
+            ts = datetime.datetime.strptime(r["ts"], "%Y-%m-%dT%H:%M:%SZ")
+            local = ts.replace(tzinfo=datetime.timezone.utc).astimezone()
+            return f"{local:%m-%d %H:%M} {r.get('script', '?')}"
+        except Exception:
+            return r.get("script", "?")
+
+    perf_labels_js = json.dumps([run_label(r) for r in runs])
+    perf_datasets_js = json.dumps([
+        {"label": name, "data": [round(r.get("phases", {}).get(name, 0), 3) for r in runs],
+         "backgroundColor": palette[i % len(palette)]}
+        for i, name in enumerate(phase_names)
+    ])
+
+    def mib(n):
+        return f"{n / 2 ** 20:.1f} MiB" if n is not None else "&ndash;"
+
+    latest = {}
+    for r in metrics:
+        latest[r.get("script", "?")] = r
+    rows = []
+    for script, r in sorted(latest.items()):
+        c = r.get("counters", {})
+        rows.append(
+            f"<tr><td style=\"text-align:left\">{script}</td><td>{run_label(r).rsplit(' ', 1)[0]}</td>"
+            f"<td>{r.get('wall_s', 0):.2f}s</td><td>{mib(r.get('peak_rss_bytes'))}</td>"
+            f"<td>{mib(c.get('bytes_read', 0))}</td><td>{c.get('lines_decoded', 0):,}</td>"
+            f"<td>{c.get('lines_skipped', 0):,}</td></tr>")
+    perf_section = f"""
+<div class="section">
+  <div class="section-header" style="border-left: 3px solid #f59e0b; color: #f59e0b;">Tracker performance</div>
+  <div class="grid">
+
+    <div class="card wide">
+      <h2>Phase time per run (s)</h2>
+      <canvas id="perfPhases"></canvas>
+    </div>
+
+    <div class="card wide">
+      <h2>Latest run per script</h2>
+      <table style="width:100%; font-size:0.78rem; color:#94a3b8; border-collapse:collapse; text-align:right">
+        <tr style="color:#64748b"><th style="text-align:left">Script</th><th>When</th><th>Wall</th>
+          <th>Peak RSS</th><th>Read</th><th>Lines decoded</th><th>Lines skipped</th></tr>
+        {"".join(rows)}
+      </table>
+    </div>
+
+  </div>
+</div>
+"""
+    perf_js = """
+// Tracker performance: seconds per phase of the latest profiled runs
+new Chart(document.getElementById('perfPhases'), {
+  type: 'bar',
+  data: { labels: __LABELS__, datasets: __DATASETS__ },
+  options: { ...baseOpts,
+    scales: {
+      x: { ...baseOpts.scales.x, stacked: true },
+      y: { ...baseOpts.scales.y, stacked: true }
+    }
+  }
+});
+"""
+    perf_js = perf_js.replace("__LABELS__", perf_labels_js).replace("__DATASETS__", perf_datasets_js)
+
 html = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="UTF-8">
 <meta name="viewport" content="width=device-width, initial-scale=1.0">
 <title>Claude Code — {project_name} tracking</title>
-<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>{zoom_plugin_tag}
 <style>
   * {{ box-sizing: border-box; margin: 0; padding: 0; }}
   body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
@@ -471,7 +824,7 @@ html = f"""<!DOCTYPE html>
 
   </div>
 </div>
-
+{perf_section}
 <script>
 const DATES = {dates_js};
 const COST_BY_DATE = {cost_by_date_js};
@@ -496,6 +849,7 @@ const TRIVIAL_BY_DATE = {trivial_by_date_js};
 const KEY_PROMPTS_BY_DATE = {key_prompts_by_date_js};
 const EFFICIENCY_BY_DATE = {efficiency_by_date_js};
 const DURATION_BY_DATE = {duration_by_date_js};
+const CUMUL_TIME_LABELS = {cumul_time_labels_js};
 const CUMUL_DURATION = {cumul_duration_js};
 const AVG_DURATION_BY_DATE = {avg_duration_by_date_js};
 const SCATTER_DATA = {scatter_data_js};
@@ -533,8 +887,10 @@ new Chart(document.getElementById('cumul'), {{
       borderColor: '#6366f1', backgroundColor: 'rgba(99,102,241,0.15)',
       fill: true, tension: 0.3, pointRadius: 2 }}]
   }},
-  options: {{ ...baseOpts, plugins: {{ ...baseOpts.plugins,
-    tooltip: {{ callbacks: {{ label: ctx => ' $' + ctx.parsed.y.toFixed(2) }} }} }} }}
+  options: {{ ...baseOpts,
+    scales: {{ x: {{ ...baseOpts.scales.x }}, y: {{ ...baseOpts.scales.y }} }},
+    plugins: {{ ...baseOpts.plugins,
+      tooltip: {{ callbacks: {{ label: ctx => ' $' + ctx.parsed.y.toFixed(2) }} }} }} }}
 }});
 
 // Cost per day bar
@@ -613,13 +969,13 @@ new Chart(document.getElementById('avgDurationDay'), {{
 new Chart(document.getElementById('cumulTime'), {{
   type: 'line',
   data: {{
-    labels: CUMUL_LABELS,
+    labels: CUMUL_TIME_LABELS,
     datasets: [{{ label: 'Cumulative time', data: CUMUL_DURATION,
       borderColor: '#22d3ee', backgroundColor: 'rgba(34,211,238,0.15)',
       fill: true, tension: 0.3, pointRadius: 2 }}]
   }},
   options: {{ ...baseOpts,
-    scales: {{ ...baseOpts.scales,
+    scales: {{ x: {{ ...baseOpts.scales.x }},
       y: {{ ...baseOpts.scales.y,
         ticks: {{ ...baseOpts.scales.y.ticks, callback: v => formatDuration(v) }} }} }},
     plugins: {{ ...baseOpts.plugins,
@@ -757,10 +1113,14 @@ new Chart(document.getElementById('promptStack'), {{
     }}
   }}
 }});
-</script>
+{zoom_js}{perf_js}</script>
 </body>
 </html>
 """
 
-with open(output_file, "w") as f:
+profiling.mark("write")
+# Hooks can regenerate concurrently; a browser never sees a half-written page
+tmp = f"{output_file}.{os.getpid()}.tmp"
+with open(tmp, "w") as f:
     f.write(html)
+os.replace(tmp, output_file)
@@ -0,0 +1,153 @@
+"""
+Cross-project rollups for `cost-summary.py --all` and `generate-charts.py --all`.
+
+Every transcript directory under ~/.claude/projects/ is mapped back to the
+git root it was recorded in (the `cwd` of its first transcript line, walked
+up to .git; several slugs can share one root). Each project with a
+.claude/tracking/ store contributes its (date, model) rollups, computed by
+its own store and so served from that store's rollup cache.
+
+The merged index, ~/.claude/tracking-global.json, keeps each project's
+rollups next to the stat-only signature of its store files. A global run
+stats every store and only re-reads the projects whose signature changed,
+several at a time.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from token_store import open_store, summarize_groups
+from transcripts import list_transcripts, open_transcript, read_sidecar
+
+PROJECTS_DIR = os.path.expanduser("~/.claude/projects")
+INDEX_FILE = os.path.expanduser("~/.claude/tracking-global.json")
+
+
+def _git_root(path):
+    while path and path != "/":
+        if os.path.isdir(os.path.join(path, ".git")):
+            return path
+        path = os.path.dirname(path)
+    return None
+
+
+def _transcript_cwd(slug_dir):
+    """The cwd recorded in the slug's transcripts, or None."""
+    for jf in list_transcripts(slug_dir):
+        sidecar = read_sidecar(jf)
+        if sidecar and sidecar.get("cwd"):
+            return sidecar["cwd"]
+        try:
+            with open_transcript(jf) as f:
+                for _, line in zip(range(20), f):
+                    if b'"cwd"' not in line:
+                        continue
+                    cwd = json.loads(line).get("cwd")
+                    if cwd:
+                        return cwd
+        except Exception:
+            continue
+    return None
+
+
+def discover(slugs):
+    """Project roots with a tracking store, from every slug directory.
+
+    slugs is the index's slug -> root cache and is updated in place; a slug
+    is only resolved (one transcript line read) the first time it is seen.
+    """
+    roots = set()
+    try:
+        names = os.listdir(PROJECTS_DIR)
+    except OSError:
+        names = []
+    for slug in names:
+        slug_dir = os.path.join(PROJECTS_DIR, slug)
+        if not os.path.isdir(slug_dir):
+            continue
+        if slugs.get(slug) is None:
+            cwd = _transcript_cwd(slug_dir)
+            slugs[slug] = _git_root(cwd) if cwd else None
+        root = slugs[slug]
+        if root and os.path.isdir(os.path.join(root, ".claude", "tracking")):
+            roots.add(root)
+    for slug in [s for s in slugs if s not in names]:
+        del slugs[slug]
+    return sorted(roots)
+
+
+def project_rollup(root, cached=None):
+    """{"sig", "groups", "sessions", "sessions_with_tokens"} for one project,
+    reusing cached when the store's files have not changed."""
+    store = open_store(os.path.join(root, ".claude", "tracking"))
+    sig = store.signature()
+    if cached and cached.get("sig") == sig:
+        return cached
+    summary = store.summary()
+    groups = store.rollups()
+    return {"sig": sig,
+            "groups": [[d, model, row] for (d, model), row in sorted(groups.items())],
+            "sessions": summary["sessions"],
+            "sessions_with_tokens": summary["sessions_with_tokens"]}
+
+
+def load_index():
+    try:
+        with open(INDEX_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_index(index):
+    os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+    tmp = INDEX_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, INDEX_FILE)
+
+
+def refresh(jobs=8):
+    """Bring the merged index up to date; returns root -> project rollup."""
+    index = load_index()
+    slugs = index.get("slugs", {})
+    cached = index.get("projects", {})
+    roots = discover(slugs)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = pool.map(lambda r: project_rollup(r, cached.get(r)), roots)
+        projects = {}
+        for root, result in zip(roots, results):
+            projects[root] = result
+
+    if projects != cached or slugs != index.get("slugs"):
+        save_index({"slugs": slugs, "projects": projects})
+    return projects
+
+
+def merge(projects):
+    """One summary (store.summary() shape) over every project, plus
+    "groups" ((date, model) -> counters) and "by_project"."""
+    groups = {}
+    sessions = 0
+    sessions_with_tokens = 0
+    by_project = {}
+    for root, p in projects.items():
+        cost = 0
+        turns = 0
+        for d, model, row in p["groups"]:
+            g = groups.get((d, model))
+            if g is None:
+                groups[(d, model)] = dict(row)
+            else:
+                for k, v in row.items():
+                    g[k] += v
+            cost += row["cost"]
+            turns += row["turns"]
+        sessions += p["sessions"]
+        sessions_with_tokens += p["sessions_with_tokens"]
+        by_project[root] = {"cost": cost, "turns": turns, "sessions": p["sessions"]}
+    result = summarize_groups(groups, sessions, sessions_with_tokens)
+    result["groups"] = groups
+    result["by_project"] = by_project
+    return result
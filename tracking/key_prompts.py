@@ -0,0 +1,74 @@
+"""
+Per-day metadata for the key-prompts/ journal, shared by
+update-prompts-index.py and generate-charts.py.
+
+Each key-prompts/YYYY-MM-DD.md reduces to
+
+  {"entries": n, "titles": [first three ## titles], "more": bool,
+   "categories": {category: n}}
+
+cached in <tracking_dir>/key-prompts-cache.json under the file's
+(size, mtime), so a run only reads the day files written since the last one.
+"""
+import glob
+import json
+import os
+import re
+
+CACHE_FILE = "key-prompts-cache.json"
+
+ENTRY_RE = re.compile(r'^## (?!Key Prompts)', re.MULTILINE)
+TITLE_RE = re.compile(r'^## (.+)', re.MULTILINE)
+CATEGORY_RE = re.compile(r'^\*\*Category\*\*: (\S+)', re.MULTILINE)
+
+
+def parse(content):
+    # The file title ("Key Prompts — ...") is a ## heading too
+    titles = [t for t in TITLE_RE.findall(content) if not t.startswith("Key Prompts")]
+    categories = {}
+    for c in CATEGORY_RE.findall(content):
+        categories[c] = categories.get(c, 0) + 1
+    return {"entries": len(ENTRY_RE.findall(content)), "titles": titles[:3],
+            "more": len(titles) > 3, "categories": categories}
+
+
+def load(tracking_dir):
+    """{date: metadata} for every day file in tracking_dir/key-prompts, by date."""
+    files = sorted(glob.glob(os.path.join(tracking_dir, "key-prompts", "????-??-??.md")))
+    cache_file = os.path.join(tracking_dir, CACHE_FILE)
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except Exception:
+        cache = {}
+    changed = False
+    fresh = {}
+    days = {}
+
+    for path in files:
+        name = os.path.basename(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        c = cache.get(name)
+        if not c or c.get("size") != st.st_size or c.get("mtime") != st.st_mtime_ns:
+            try:
+                with open(path) as f:
+                    meta = parse(f.read())
+            except OSError:
+                continue
+            c = {"size": st.st_size, "mtime": st.st_mtime_ns, "meta": meta}
+            changed = True
+        fresh[name] = c
+        days[os.path.splitext(name)[0]] = c["meta"]
+
+    if (changed or len(fresh) != len(cache)) and os.path.isdir(tracking_dir):
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(fresh, f)
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+    return days
@@ -0,0 +1,79 @@
+"""
+Model pricing shared by the tracking scripts.
+
+PRICES is a versioned table: each row is a model family (a regex searched in
+the model id), the date the price took effect, and USD per million tokens
+for input, cache writes, cache reads and output. A turn is priced with the
+first family that matches its model, at the latest row of that family in
+effect on the turn's date. Models matching no family are priced as sonnet,
+which is what the tracker has always done.
+
+Rows in ~/.claude/tracking-pricing.json (a list of objects with the same
+keys as PRICE_FIELDS) are tried before the built-in table, so a price change
+can be recorded without editing this file. `reprice.py` then recomputes
+estimated_cost_usd for the whole history from the stored token counts.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+
+PRICE_FIELDS = ("family", "effective", "input", "cache_write", "cache_read", "output")
+
+# family, effective date, USD per MTok: input, cache write, cache read, output
+PRICES = [
+    ("opus-4-[5-9]|opus-[5-9]", "2025-11-24", 5.00, 6.25, 0.50, 25.00),
+    ("opus", "2024-02-29", 15.00, 18.75, 1.50, 75.00),
+    ("haiku-4|haiku-[5-9]", "2025-10-15", 1.00, 1.25, 0.10, 5.00),
+    ("3-5-haiku|haiku-3-5", "2024-11-04", 0.80, 1.00, 0.08, 4.00),
+    ("haiku", "2024-03-07", 0.25, 0.30, 0.03, 1.25),
+    ("sonnet", "2024-02-29", 3.00, 3.75, 0.30, 15.00),
+]
+DEFAULT_FAMILY = "sonnet"
+OVERRIDES_FILE = os.path.expanduser("~/.claude/tracking-pricing.json")
+
+
+def load_table():
+    """[(family, [(effective, rates), ...] newest first)] in match order."""
+    rows = []
+    try:
+        with open(OVERRIDES_FILE) as f:
+            rows = [tuple(r[k] for k in PRICE_FIELDS) for r in json.load(f)]
+    except Exception:
+        rows = []
+    families = {}
+    for family, effective, *rates in rows + PRICES:
+        families.setdefault(family, []).append((effective, tuple(r / 1e6 for r in rates)))
+    return [(family, sorted(versions, reverse=True)) for family, versions in families.items()]
+
+
+TABLE = load_table()
+
+
+def table_version():
+    """Latest effective date in the table, to tell price generations apart."""
+    return max(v[0][0] for _, v in TABLE)
+
+
+@lru_cache(maxsize=None)
+def rates(model, date):
+    """Per-token (input, cache write, cache read, output) prices for a turn
+    of model on date (YYYY-MM-DD; None means today's prices)."""
+    model = model or ""
+    versions = None
+    for family, vs in TABLE:
+        if re.search(family, model):
+            versions = vs
+            break
+    if versions is None:
+        versions = dict(TABLE)[DEFAULT_FAMILY]
+    for effective, r in versions:
+        if date is None or effective <= date:
+            return r
+    # Older than every row of the family: its earliest known price
+    return versions[-1][1]
+
+
+def turn_cost(model, date, inp, cache_create, cache_read, out):
+    r = rates(model, date)
+    return round(inp * r[0] + cache_create * r[1] + cache_read * r[2] + out * r[3], 4)
@@ -0,0 +1,138 @@
+"""
+Opt-in phase profiling for the tracking scripts.
+
+A script calls start(name) first thing. Profiling is on when the script was
+given --profile (which start() removes from sys.argv) or when
+CLAUDE_TRACKER_PROFILE=1; start() then sets the variable, so scripts the
+run starts (generate-charts after a backfill) are profiled too. Off, every
+call here is a no-op.
+
+Scripts mark where each stage begins with mark("parse"); a stage lasts
+until the next mark or the end of the run. Counters are bumped with
+count("turns_written", n). The transcript scanners keep their own counters
+(transcripts.STATS: bytes read, lines seen, lines decoded), which are
+folded in. At exit one record is appended to
+<tracking_dir>/metrics.jsonl:
+
+  {"ts", "script", "wall_s", "peak_rss_bytes", "phases": {name: seconds},
+   "counters": {name: n}}
+
+generate-charts.py shows the latest records as its "Tracker performance"
+panel. With backfill --jobs N the transcript counters only cover what the
+main process parsed.
+"""
+import atexit
+import json
+import os
+import sys
+import time
+
+METRICS_FILE = "metrics.jsonl"
+ENV = "CLAUDE_TRACKER_PROFILE"
+
+_active = None
+
+
+class Profiler:
+    def __init__(self, script):
+        self.script = script
+        self.tracking_dir = None
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.current = "startup"
+        self.since = self.start
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases[self.current] = self.phases.get(self.current, 0) + now - self.since
+        self.current = name
+        self.since = now
+
+    def finish(self):
+        self.mark(None)
+        if not self.tracking_dir or not os.path.isdir(self.tracking_dir):
+            return
+        from transcripts import STATS
+        counters = dict(self.counters)
+        for k, v in STATS.items():
+            if v:
+                counters[k] = counters.get(k, 0) + v
+        if "lines" in counters:
+            counters["lines_skipped"] = counters["lines"] - counters.get("lines_decoded", 0)
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "script": self.script,
+            "wall_s": round(time.perf_counter() - self.start, 4),
+            "peak_rss_bytes": peak_rss(),
+            "phases": {k: round(v, 4) for k, v in self.phases.items()},
+            "counters": counters,
+        }
+        try:
+            with open(os.path.join(self.tracking_dir, METRICS_FILE), "a") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError:
+            pass
+
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def start(script):
+    """Begin profiling this run if asked to; returns the Profiler or None."""
+    global _active
+    enabled = os.environ.get(ENV) == "1"
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+        enabled = True
+    if not enabled or _active is not None:
+        return _active
+    os.environ[ENV] = "1"
+    _active = Profiler(script)
+    atexit.register(_active.finish)
+    return _active
+
+
+def set_tracking_dir(tracking_dir):
+    """Where the metrics record goes, once the script knows."""
+    if _active is not None:
+        _active.tracking_dir = tracking_dir
+
+
+def mark(name):
+    """Start phase name, ending the current one."""
+    if _active is not None:
+        _active.mark(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.counters[name] = _active.counters.get(name, 0) + n
+
+
+def load_metrics(tracking_dir, limit=200):
+    """The last limit metrics records, oldest first (reads only the tail)."""
+    path = os.path.join(tracking_dir, METRICS_FILE)
+    try:
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - limit * 1024))
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    if size > limit * 1024:
+        lines = lines[1:]   # probably cut mid-record
+    records = []
+    for line in lines[-limit:]:
+        try:
+            records.append(json.loads(line))
+        except Exception:
+            pass
+    return records
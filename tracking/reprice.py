@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Recompute estimated_cost_usd for every recorded turn with the current
+pricing table (pricing.py, plus ~/.claude/tracking-pricing.json).
+
+Usage:
+  python3 reprice.py <project_root> [--dry-run]
+
+Costs are rebuilt from the stored token counts, so transcripts are not read.
+Prices are looked up once per distinct (model, date); the SQLite store then
+rewrites every cost in a single UPDATE, the segment store appends the
+changed turns month by month. --dry-run only reports what would change.
+"""
+import sys, os
+
+from pricing import rates, table_version
+from token_store import open_store
+
+args = sys.argv[1:]
+dry_run = "--dry-run" in args
+args = [a for a in args if a != "--dry-run"]
+if not args:
+    sys.exit(__doc__.strip())
+
+project_root = os.path.abspath(args[0])
+tracking_dir = os.path.join(project_root, ".claude", "tracking")
+tokens_file = os.path.join(tracking_dir, "tokens.json")
+
+if not os.path.isdir(tracking_dir):
+    sys.exit(f"No tracking directory at {tracking_dir}")
+
+store = open_store(tracking_dir)
+turns, changed, old_total, new_total = store.reprice(rates, dry_run=dry_run)
+
+print(f"Prices as of {table_version()}: {changed} of {turns} turn(s) "
+      f"{'would change' if dry_run else 'repriced'}, "
+      f"${old_total:.2f} -> ${new_total:.2f}.")
+
+if changed and not dry_run:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    charts_html = os.path.join(tracking_dir, "charts.html")
+    os.system(f'python3 "{script_dir}/generate-charts.py" "{tokens_file}" "{charts_html}" 2>/dev/null')
@@ -0,0 +1,880 @@
+"""
+Append-only token store shared by the tracking scripts.
+
+Turns live in month segments under <tracking_dir>/tokens/YYYY-MM.jsonl, one
+JSON record per line. Writers only ever append: an upsert is a new record
+for the same (session_id, turn_index) key and a delete is a tombstone record
+({"deleted": true, ...}). Readers resolve each month independently, last
+record wins, so memory is bounded by the largest month.
+
+The old whole-file <tracking_dir>/tokens.json is still read as the base layer
+underneath the segments. compact() folds it in and rewrites every segment
+with one live record per key.
+
+Alternatively the turns can live in an SQLite database,
+<tracking_dir>/tokens.db, keyed on (session_id, turn_index) with indexes on
+date and model, so upserts, dedup lookups and summary GROUP BYs run inside
+the engine. It is opt-in: `compact-tokens.py <project_root> --to sqlite`
+migrates the store and open_store() picks the database whenever it exists.
+
+Both backends keep materialized per (date, model) rollups — cost, turns,
+tokens by type, duration and duration-histogram buckets — so summaries and
+dashboards cost O(days x models) instead of O(turns). SQLite maintains them
+with triggers as turns are upserted; the segment store caches them per month
+in <tracking_dir>/rollups.json and only recomputes months whose segment
+changed (normally just the current one).
+
+Hooks run asynchronously, so several processes may write at once. Every
+write goes through group_commit(): the batch is queued as its own file under
+<tracking_dir>/pending/ (temp file plus rename), then written by whichever
+writer holds the tracking dir's advisory lock (tokens.lock), together with
+every other batch queued by then. Under contention the lock holder waits a
+short batching window first, so a burst of hooks becomes one commit.
+
+Each commit also refreshes <tracking_dir>/today.json, the cost of every
+turn dated today (UTC) with its timestamp, so the cost-alert hook can read
+today's total and recent burn rate without opening the store. It is rebuilt
+from the store whenever it is missing or from an earlier day.
+"""
+import calendar
+import json
+import os
+import sqlite3
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:     # Windows: writers are not serialized
+    fcntl = None
+
+SEGMENTS_DIR = "tokens"
+LEGACY_FILE = "tokens.json"
+STORE_ID_FILE = ".store-id"
+SQLITE_FILE = "tokens.db"
+ROLLUPS_FILE = "rollups.json"
+TODAY_FILE = "today.json"
+LOCK_FILE = "tokens.lock"
+PENDING_DIR = "pending"
+# How long a writer that had to wait for the lock holds it before committing,
+# to take in batches from writers that arrived in the same burst
+BATCH_WINDOW = float(os.environ.get("CLAUDE_TRACKER_BATCH_MS", "50")) / 1000
+
+# Entry fields in the order compute_turns writes them
+COLUMNS = ("date", "project", "session_id", "turn_index", "turn_timestamp",
+           "input_tokens", "cache_creation_tokens", "cache_read_tokens",
+           "output_tokens", "total_tokens", "estimated_cost_usd", "model",
+           "duration_seconds")
+
+
+def entry_key(e):
+    return (e.get("session_id"), e.get("turn_index"))
+
+
+def sort_key(e):
+    return (e.get("date", ""), e.get("session_id", ""), e.get("turn_index", 0))
+
+
+def month_of(e):
+    return (e.get("date") or "")[:7] or "unknown"
+
+
+def tombstone(e):
+    """Record that deletes e's key when appended."""
+    return {"deleted": True, "date": e.get("date"),
+            "session_id": e.get("session_id"), "turn_index": e.get("turn_index")}
+
+
+_held = {}     # lock path -> [fd, depth], for re-entrant write_lock()
+
+
+@contextmanager
+def write_lock(tracking_dir):
+    """Exclusive advisory lock serializing writers of one tracking dir.
+    Re-entrant within a process. Yields True if another process held it
+    when we asked."""
+    path = os.path.join(tracking_dir, LOCK_FILE)
+    held = _held.get(path)
+    if held is not None:
+        held[1] += 1
+        try:
+            yield False
+        finally:
+            held[1] -= 1
+        return
+    os.makedirs(tracking_dir, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    contended = False
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                contended = True
+                fcntl.flock(fd, fcntl.LOCK_EX)
+        _held[path] = [fd, 1]
+        yield contended
+    finally:
+        _held.pop(path, None)
+        os.close(fd)
+
+
+def _locked(method):
+    """Run a store method holding its tracking dir's write lock."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with write_lock(self.tracking_dir):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _read_batch(path):
+    records = []
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except Exception:
+                    pass
+    except OSError:
+        pass
+    return records
+
+
+def group_commit(store, records):
+    """Durably queue records, then commit them with store._write(records)
+    under the write lock, merged with every batch other writers have queued.
+
+    A writer that finds its batch already committed by the lock holder has
+    nothing left to do; a batch left behind by a crash is committed by the
+    next writer. Once the lock is held the backend is looked up again: if
+    the store was migrated (compact-tokens.py --to) while we waited, the
+    batch goes to the new one. Called with the lock already held, records
+    are written directly.
+    """
+    tracking_dir = store.tracking_dir
+    if os.path.join(tracking_dir, LOCK_FILE) in _held:
+        store._write(records)
+        return
+    pending = os.path.join(tracking_dir, PENDING_DIR)
+    os.makedirs(pending, exist_ok=True)
+    path = os.path.join(pending, f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+    with open(path + ".tmp", "w") as f:
+        f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+    os.replace(path + ".tmp", path)
+
+    with write_lock(tracking_dir) as contended:
+        if not os.path.exists(path):
+            return
+        if contended and BATCH_WINDOW > 0:
+            time.sleep(BATCH_WINDOW)
+        names = sorted(n for n in os.listdir(pending) if n.endswith(".jsonl"))
+        batch = []
+        for name in names:
+            batch.extend(_read_batch(os.path.join(pending, name)))
+        current = open_store(tracking_dir)
+        if type(current) is not type(store):
+            store = current
+        store._write(batch)
+        # Only once committed; replaying a batch is harmless (upserts)
+        for name in names:
+            os.remove(os.path.join(pending, name))
+
+
+def _turn_epoch(ts):
+    try:
+        return calendar.timegm(time.strptime(ts, "%Y-%m-%dT%H:%M:%SZ"))
+    except (TypeError, ValueError):
+        return None
+
+
+def update_today(store, records=None):
+    """Apply just-committed records to the store's today.json, or rebuild it
+    from the store when there is no usable file for today.
+
+    today.json: {"date": YYYY-MM-DD (UTC), "cost": total,
+                 "turns": {"session_id:turn_index": [epoch or null, cost]}}
+    """
+    path = os.path.join(store.tracking_dir, TODAY_FILE)
+    today = time.strftime("%Y-%m-%d", time.gmtime())
+    turns = None
+    if records is not None:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("date") == today and isinstance(data.get("turns"), dict):
+                turns = data["turns"]
+        except Exception:
+            pass
+    if turns is None:
+        turns = {f"{sid}:{idx}": [_turn_epoch(ts), cost or 0]
+                 for sid, idx, ts, cost in store.iter_rows(
+                     ("session_id", "turn_index", "turn_timestamp", "estimated_cost_usd"),
+                     since=today, until=today)}
+    else:
+        for r in records:
+            key = f"{r.get('session_id')}:{r.get('turn_index')}"
+            if r.get("deleted") or r.get("date") != today:
+                turns.pop(key, None)
+            else:
+                turns[key] = [_turn_epoch(r.get("turn_timestamp")), r.get("estimated_cost_usd") or 0]
+    data = {"date": today, "cost": round(sum(c for _, c in turns.values()), 4), "turns": turns}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def short_model(model):
+    return model.split("-20")[0] if "-20" in model else model
+
+
+# Fine duration buckets: every edge used by the dashboard's histogram ranges,
+# so each of those ranges can be summed from the rollups. Bucket hN counts
+# turns with 0 < duration and DURATION_EDGES[N-1] <= duration < DURATION_EDGES[N].
+DURATION_EDGES = (5, 10, 15, 20, 25, 30, 40, 50, 60,
+                  300, 600, 900, 1200, 1500, 1800, 2400, 3000, 3600)
+ROLLUP_FIELDS = ("cost", "turns", "input", "cache_create", "cache_read", "output",
+                 "total", "duration") + tuple(f"h{i}" for i in range(len(DURATION_EDGES) + 1))
+
+
+def _group_row():
+    return dict.fromkeys(ROLLUP_FIELDS, 0)
+
+
+_BUCKETS = tuple(f"h{i}" for i in range(len(DURATION_EDGES) + 1))
+
+
+def rollup_count(row, cost, inp, cache_create, cache_read, out, total, duration):
+    """Count one turn into a ROLLUP_FIELDS row; every rollup (the store's
+    and aggregate.py's column reports) goes through here."""
+    row["cost"] += cost
+    row["turns"] += 1
+    row["input"] += inp
+    row["cache_create"] += cache_create
+    row["cache_read"] += cache_read
+    row["output"] += out
+    row["total"] += total
+    row["duration"] += duration
+    if duration > 0:
+        row[_BUCKETS[bisect_right(DURATION_EDGES, duration)]] += 1
+
+
+def rollup_add(row, e):
+    rollup_count(row, e.get("estimated_cost_usd", 0), e.get("input_tokens", 0),
+                 e.get("cache_creation_tokens", 0), e.get("cache_read_tokens", 0),
+                 e.get("output_tokens", 0), e.get("total_tokens", 0),
+                 e.get("duration_seconds", 0))
+
+
+def _merge_rows(groups, d, model, row):
+    g = groups.get((d, model))
+    if g is None:
+        groups[(d, model)] = dict(row)
+    else:
+        for k, v in row.items():
+            g[k] += v
+
+
+def summarize_groups(groups, sessions, sessions_with_tokens):
+    """Fold (date, model) -> totals groups into the summary shape."""
+    by_date = defaultdict(_group_row)
+    by_model = defaultdict(lambda: {"cost": 0, "turns": 0})
+    totals = _group_row()
+    for (d, model), g in groups.items():
+        for k, v in g.items():
+            by_date[d][k] += v
+            totals[k] += v
+        m = by_model[short_model(model)]
+        m["cost"] += g["cost"]
+        m["turns"] += g["turns"]
+    return {"by_date": dict(by_date), "by_model": dict(by_model), "totals": totals,
+            "sessions": sessions, "sessions_with_tokens": sessions_with_tokens}
+
+
+class TokenStore:
+    def __init__(self, tracking_dir):
+        self.tracking_dir = tracking_dir
+        self.segments_dir = os.path.join(tracking_dir, SEGMENTS_DIR)
+        self.legacy_file = os.path.join(tracking_dir, LEGACY_FILE)
+
+    # --- reading ---
+
+    def segment_path(self, month):
+        return os.path.join(self.segments_dir, month + ".jsonl")
+
+    def segment_months(self):
+        try:
+            names = os.listdir(self.segments_dir)
+        except OSError:
+            return []
+        return sorted(n[:-len(".jsonl")] for n in names if n.endswith(".jsonl"))
+
+    def read_segment(self, month):
+        """Yield raw records (including tombstones) from one segment, in write order."""
+        try:
+            with open(self.segment_path(month), "rb") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except Exception:
+                        # Torn trailing write — ignore
+                        pass
+        except OSError:
+            return
+
+    def load_legacy(self):
+        try:
+            with open(self.legacy_file) as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except Exception:
+            return []
+
+    def _legacy_by_month(self):
+        legacy = defaultdict(list)
+        for e in self.load_legacy():
+            legacy[month_of(e)].append(e)
+        return legacy
+
+    def _live_month(self, month, legacy_entries=()):
+        """Live entries of one month, sorted: legacy base, then the segment."""
+        live = {}
+        for e in legacy_entries:
+            live[entry_key(e)] = e
+        for rec in self.read_segment(month):
+            if rec.get("deleted"):
+                live.pop(entry_key(rec), None)
+            else:
+                live[entry_key(rec)] = rec
+        return sorted(live.values(), key=sort_key)
+
+    def iter_entries(self, since=None, until=None):
+        """Yield live entries sorted by (date, session_id, turn_index).
+
+        since/until (YYYY-MM-DD, inclusive) limit the dates: months outside
+        the range are never read, and the boundary months are cut by
+        bisecting their sorted entries. Undated entries only come back when
+        neither is given.
+        """
+        legacy = self._legacy_by_month()
+        months = sorted(set(legacy) | set(self.segment_months()))
+        if since or until:
+            months = [m for m in months if m != "unknown"]
+            lo = bisect_left(months, since[:7]) if since else 0
+            hi = bisect_right(months, until[:7]) if until else len(months)
+            months = months[lo:hi]
+        for month in months:
+            live = self._live_month(month, legacy.pop(month, ()))
+            if since or until:
+                dates = [e.get("date", "") for e in live]
+                lo = bisect_left(dates, since) if since else 0
+                hi = bisect_right(dates, until) if until else len(live)
+                live = live[lo:hi]
+            yield from live
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def iter_rows(self, fields, since=None, until=None):
+        """Yield tuples of the given entry fields (None when absent), in
+        iter_entries() order."""
+        for e in self.iter_entries(since, until):
+            yield tuple(e.get(k) for k in fields)
+
+    def session_index(self):
+        """(old_sessions, turns_per_session): old-format entries per session
+        and the number of per-turn entries per session."""
+        old_sessions = {}
+        turns_per_session = {}
+        for e in self.iter_entries():
+            sid = e.get("session_id")
+            if "turn_index" not in e:
+                old_sessions.setdefault(sid, []).append(e)
+            else:
+                turns_per_session[sid] = turns_per_session.get(sid, 0) + 1
+        return old_sessions, turns_per_session
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def _rollup_months(self):
+        """Per-month rollups, recomputing only months whose segment (or the
+        legacy tokens.json underneath) changed since they were cached."""
+        path = os.path.join(self.tracking_dir, ROLLUPS_FILE)
+        try:
+            with open(path) as f:
+                cache = json.load(f)
+        except Exception:
+            cache = {}
+        months = cache.get("months", {})
+
+        legacy = None
+        legacy_sig = self._signature(self.legacy_file)
+        if cache.get("legacy_sig") != legacy_sig:
+            legacy = self._legacy_by_month()
+            legacy_months = sorted(legacy)
+            months = {}
+        else:
+            legacy_months = cache.get("legacy_months", [])
+
+        current = {}
+        changed = False
+        for month in sorted(set(legacy_months) | set(self.segment_months())):
+            sig = self._signature(self.segment_path(month))
+            m = months.get(month)
+            if m is None or m.get("sig") != sig:
+                if legacy is None:
+                    legacy = self._legacy_by_month()
+                rows = defaultdict(lambda: defaultdict(_group_row))
+                sessions = set()
+                token_sessions = set()
+                for e in self._live_month(month, legacy.get(month, ())):
+                    rollup_add(rows[e.get("date", "unknown")][e.get("model", "unknown")], e)
+                    sessions.add(e.get("session_id"))
+                    if e.get("total_tokens", 0) > 0:
+                        token_sessions.add(e.get("session_id"))
+                m = {"sig": sig,
+                     "rows": {d: dict(models) for d, models in rows.items()},
+                     "sessions": sorted(sessions, key=str),
+                     "token_sessions": sorted(token_sessions, key=str)}
+                changed = True
+            current[month] = m
+
+        if changed or len(current) != len(months):
+            # Readers refresh the cache concurrently; each writes its own temp
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"legacy_sig": legacy_sig, "legacy_months": legacy_months,
+                           "months": current}, f)
+            os.replace(tmp, path)
+        return current
+
+    def rollups(self):
+        """(date, model) -> counters (ROLLUP_FIELDS) over all live entries."""
+        groups = {}
+        for m in self._rollup_months().values():
+            for d, models in m["rows"].items():
+                for model, row in models.items():
+                    _merge_rows(groups, d, model, row)
+        return groups
+
+    def summary(self):
+        """Totals, per-date and per-model aggregates from the rollups."""
+        groups = {}
+        sessions = set()
+        token_sessions = set()
+        for m in self._rollup_months().values():
+            for d, models in m["rows"].items():
+                for model, row in models.items():
+                    _merge_rows(groups, d, model, row)
+            sessions.update(m["sessions"])
+            token_sessions.update(m["token_sessions"])
+        return summarize_groups(groups, len(sessions), len(token_sessions))
+
+    def signature(self):
+        """Cheap stat-only fingerprint of the store's files; it changes
+        whenever any turn is written."""
+        return [self._signature(self.legacy_file),
+                [[m, self._signature(self.segment_path(m))] for m in self.segment_months()]]
+
+    def store_id(self):
+        """Identifier that changes whenever the segment store is recreated."""
+        try:
+            with open(os.path.join(self.segments_dir, STORE_ID_FILE)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    # --- writing ---
+
+    def _ensure_dir(self):
+        if not os.path.isdir(self.segments_dir):
+            os.makedirs(self.segments_dir, exist_ok=True)
+        id_file = os.path.join(self.segments_dir, STORE_ID_FILE)
+        if not os.path.exists(id_file):
+            with open(id_file, "w") as f:
+                f.write(uuid.uuid4().hex + "\n")
+
+    def append(self, records):
+        """Append entries and/or tombstones through group_commit()."""
+        records = list(records)
+        if records:
+            group_commit(self, records)
+        return len(records)
+
+    def _write(self, records):
+        """One write per touched segment."""
+        by_month = defaultdict(list)
+        for r in records:
+            by_month[month_of(r)].append(json.dumps(r, separators=(",", ":")) + "\n")
+        if not by_month:
+            return
+        self._ensure_dir()
+        for month, lines in by_month.items():
+            with open(self.segment_path(month), "a+b") as f:
+                # A write torn by a crash must not swallow the next record
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        lines.insert(0, "\n")
+                f.write("".join(lines).encode())
+        update_today(self, records)
+
+    def delete(self, entries):
+        return self.append(tombstone(e) for e in entries)
+
+    @_locked
+    def reprice(self, rates, dry_run=False):
+        """Recompute estimated_cost_usd from the stored token counts.
+
+        rates(model, date) returns per-token (input, cache write, cache read,
+        output) prices, as pricing.rates does. Entries without token counts
+        (old session-level records) keep their cost. Changed entries are
+        appended one month at a time. Returns (entries, changed, old_total,
+        new_total).
+        """
+        count = changed = 0
+        old_total = new_total = 0.0
+        legacy = self._legacy_by_month()
+        for month in sorted(set(legacy) | set(self.segment_months())):
+            updates = []
+            for e in self._live_month(month, legacy.pop(month, ())):
+                old = e.get("estimated_cost_usd") or 0
+                count += 1
+                old_total += old
+                if e.get("input_tokens") is None and e.get("output_tokens") is None:
+                    new_total += old
+                    continue
+                r = rates(e.get("model"), e.get("date"))
+                cost = round((e.get("input_tokens") or 0) * r[0]
+                             + (e.get("cache_creation_tokens") or 0) * r[1]
+                             + (e.get("cache_read_tokens") or 0) * r[2]
+                             + (e.get("output_tokens") or 0) * r[3], 4)
+                new_total += cost
+                if abs(cost - old) > 1e-9:
+                    updates.append(dict(e, estimated_cost_usd=cost))
+            changed += len(updates)
+            if updates and not dry_run:
+                self.append(updates)
+        return count, changed, old_total, new_total
+
+    @_locked
+    def clear(self):
+        """Remove every segment and empty tokens.json (after a migration).
+        today.json stays: it describes the turns, now in the new store."""
+        for month in self.segment_months():
+            os.remove(self.segment_path(month))
+        rollups_file = os.path.join(self.tracking_dir, ROLLUPS_FILE)
+        if os.path.exists(rollups_file):
+            os.remove(rollups_file)
+        if os.path.exists(self.legacy_file):
+            with open(self.legacy_file, "w") as f:
+                f.write("[]\n")
+
+    @_locked
+    def compact(self):
+        """Fold tokens.json into the segments and rewrite each segment with
+        one live record per key. Returns (records_before, records_after)."""
+        before = 0
+        after = 0
+        legacy = defaultdict(list)
+        for e in self.load_legacy():
+            legacy[month_of(e)].append(e)
+            before += 1
+
+        self._ensure_dir()
+        for month in sorted(set(legacy) | set(self.segment_months())):
+            before += sum(1 for _ in self.read_segment(month))
+            live = self._live_month(month, legacy.pop(month, ()))
+            path = self.segment_path(month)
+            if not live:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                for e in live:
+                    f.write(json.dumps(e, separators=(",", ":")) + "\n")
+            os.replace(tmp, path)
+            after += len(live)
+
+        # Everything now lives in the segments; leave an empty legacy file so
+        # tools that look for tokens.json still find the tracking dir.
+        if os.path.exists(self.legacy_file):
+            tmp = self.legacy_file + ".tmp"
+            with open(tmp, "w") as f:
+                f.write("[]\n")
+            os.replace(tmp, self.legacy_file)
+        return before, after
+
+
+def _rollup_exprs(r):
+    """SQL expression per ROLLUP_FIELDS column for one turns row aliased r."""
+    d = f"COALESCE({r}.duration_seconds, 0)"
+    exprs = [f"COALESCE({r}.estimated_cost_usd, 0)", "1",
+             f"COALESCE({r}.input_tokens, 0)", f"COALESCE({r}.cache_creation_tokens, 0)",
+             f"COALESCE({r}.cache_read_tokens, 0)", f"COALESCE({r}.output_tokens, 0)",
+             f"COALESCE({r}.total_tokens, 0)", d]
+    lo = 0
+    for hi in DURATION_EDGES + (None,):
+        cond = f"{d} > 0 AND {d} >= {lo}" + (f" AND {d} < {hi}" if hi is not None else "")
+        exprs.append(f"(CASE WHEN {cond} THEN 1 ELSE 0 END)")
+        lo = hi
+    return exprs
+
+
+def _rollup_ddl():
+    cols = ", ".join(f"{f} {'REAL' if f == 'cost' else 'INTEGER'} NOT NULL DEFAULT 0"
+                     for f in ROLLUP_FIELDS)
+    group = "date = COALESCE({r}.date, 'unknown') AND model = COALESCE({r}.model, 'unknown')"
+    add = ", ".join(f"{f} = {f} + {x}" for f, x in zip(ROLLUP_FIELDS, _rollup_exprs("NEW")))
+    sub = ", ".join(f"{f} = {f} - {x}" for f, x in zip(ROLLUP_FIELDS, _rollup_exprs("OLD")))
+    return f"""
+        CREATE TABLE IF NOT EXISTS rollups (
+            date TEXT NOT NULL, model TEXT NOT NULL, {cols},
+            PRIMARY KEY (date, model)
+        );
+        CREATE TRIGGER IF NOT EXISTS turns_rollup_insert AFTER INSERT ON turns BEGIN
+            INSERT OR IGNORE INTO rollups (date, model)
+                VALUES (COALESCE(NEW.date, 'unknown'), COALESCE(NEW.model, 'unknown'));
+            UPDATE rollups SET {add} WHERE {group.format(r="NEW")};
+        END;
+        CREATE TRIGGER IF NOT EXISTS turns_rollup_delete AFTER DELETE ON turns BEGIN
+            UPDATE rollups SET {sub} WHERE {group.format(r="OLD")};
+            DELETE FROM rollups WHERE {group.format(r="OLD")} AND turns <= 0;
+        END;
+    """
+
+
+class SqliteTokenStore:
+    """Same interface as TokenStore, backed by <tracking_dir>/tokens.db."""
+
+    def __init__(self, tracking_dir):
+        self.tracking_dir = tracking_dir
+        self.path = os.path.join(tracking_dir, SQLITE_FILE)
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(self.tracking_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30)
+            self._db.executescript(f"""
+                CREATE TABLE IF NOT EXISTS turns (
+                    date TEXT, project TEXT, session_id TEXT NOT NULL,
+                    turn_index INTEGER, turn_timestamp TEXT,
+                    input_tokens INTEGER, cache_creation_tokens INTEGER,
+                    cache_read_tokens INTEGER, output_tokens INTEGER,
+                    total_tokens INTEGER, estimated_cost_usd REAL, model TEXT,
+                    duration_seconds INTEGER,
+                    extra TEXT,
+                    PRIMARY KEY (session_id, turn_index)
+                );
+                CREATE INDEX IF NOT EXISTS turns_date ON turns(date, session_id, turn_index);
+                CREATE INDEX IF NOT EXISTS turns_model ON turns(model);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                INSERT OR IGNORE INTO meta VALUES ('store_id', '{uuid.uuid4().hex}');
+            """ + _rollup_ddl())
+            if not self._db.execute("SELECT 1 FROM meta WHERE key = 'rollups'").fetchone():
+                # Databases created before the rollups table existed
+                with self._db:
+                    self._rebuild_rollups()
+                    self._db.execute("INSERT INTO meta VALUES ('rollups', '1')")
+        return self._db
+
+    def _rebuild_rollups(self):
+        """Recompute the rollups table from turns, inside the caller's
+        transaction. Needed after an UPDATE, which the triggers don't see."""
+        sums = ", ".join(f"SUM({x})" for x in _rollup_exprs("t"))
+        self._db.execute("DELETE FROM rollups")
+        self._db.execute(f"""
+            INSERT INTO rollups
+            SELECT COALESCE(date, 'unknown'), COALESCE(model, 'unknown'), {sums}
+            FROM turns AS t GROUP BY 1, 2""")
+
+    def _row_to_entry(self, row):
+        # NULL columns were absent keys (old-format entries have no turn_index)
+        e = {k: v for k, v in zip(COLUMNS, row) if v is not None}
+        if row[-1]:
+            e.update(json.loads(row[-1]))
+        return e
+
+    def _entry_to_row(self, e):
+        extra = {k: v for k, v in e.items() if k not in COLUMNS}
+        return tuple(e.get(k) for k in COLUMNS) + (json.dumps(extra) if extra else None,)
+
+    # --- reading ---
+
+    @staticmethod
+    def _date_range(since, until):
+        """WHERE clause and parameters for since..until (inclusive), a range
+        scan of the turns_date index; undated rows never match one."""
+        where = []
+        params = []
+        if since:
+            where.append("date >= ?")
+            params.append(since)
+        if until:
+            where.append("date <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(where) if where else ""), params
+
+    def iter_entries(self, since=None, until=None):
+        where, params = self._date_range(since, until)
+        cur = self.db.execute(
+            f"SELECT {', '.join(COLUMNS)}, extra FROM turns{where}"
+            " ORDER BY date, session_id, turn_index", params)
+        for row in cur:
+            yield self._row_to_entry(row)
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def iter_rows(self, fields, since=None, until=None):
+        # Only the requested columns leave the engine; no dicts, no JSON.
+        where, params = self._date_range(since, until)
+        cur = self.db.execute(
+            f"SELECT {', '.join(fields)} FROM turns{where}"
+            " ORDER BY date, session_id, turn_index", params)
+        yield from cur
+
+    def signature(self):
+        return [TokenStore._signature(self.path + suffix) for suffix in ("", "-wal")]
+
+    def store_id(self):
+        return self.db.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+
+    def session_index(self):
+        old_sessions = {}
+        cur = self.db.execute(
+            f"SELECT {', '.join(COLUMNS)}, extra FROM turns WHERE turn_index IS NULL")
+        for row in cur:
+            e = self._row_to_entry(row)
+            old_sessions.setdefault(e.get("session_id"), []).append(e)
+        turns_per_session = dict(self.db.execute(
+            "SELECT session_id, COUNT(*) FROM turns WHERE turn_index IS NOT NULL GROUP BY session_id"))
+        return old_sessions, turns_per_session
+
+    def rollups(self):
+        cur = self.db.execute(f"SELECT date, model, {', '.join(ROLLUP_FIELDS)} FROM rollups")
+        return {(row[0], row[1]): dict(zip(ROLLUP_FIELDS, row[2:])) for row in cur}
+
+    def summary(self):
+        groups = self.rollups()
+        sessions, with_tokens = self.db.execute("""
+            SELECT COUNT(DISTINCT session_id),
+                   COUNT(DISTINCT CASE WHEN total_tokens > 0 THEN session_id END)
+            FROM turns""").fetchone()
+        return summarize_groups(groups, sessions, with_tokens)
+
+    # --- writing ---
+
+    def append(self, records):
+        """Upsert entries and apply tombstones through group_commit()."""
+        records = list(records)
+        if records:
+            group_commit(self, records)
+        return len(records)
+
+    def _write(self, records):
+        """Every queued batch in a single transaction; the last record for
+        a key wins, as in the segment store."""
+        final = {}
+        for r in records:
+            final[entry_key(r)] = r
+        if not final:
+            return
+        upserts = [self._entry_to_row(r) for r in final.values() if not r.get("deleted")]
+        # Upsert = delete + insert, so the rollup triggers see both sides.
+        # Old-format rows have a NULL turn_index, which `IS ?` also matches.
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM turns WHERE session_id = ? AND turn_index IS ?", list(final))
+            self.db.executemany(
+                f"INSERT INTO turns VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                upserts)
+        update_today(self, records)
+
+    def delete(self, entries):
+        return self.append(tombstone(e) for e in entries)
+
+    @_locked
+    def reprice(self, rates, dry_run=False):
+        """Recompute estimated_cost_usd in one UPDATE: rates are looked up
+        once per distinct (model, date) into a temp table and joined in."""
+        db = self.db
+        pairs = db.execute("SELECT DISTINCT model, date FROM turns").fetchall()
+        has_tokens = "(input_tokens IS NOT NULL OR output_tokens IS NOT NULL)"
+        cost = """ROUND(COALESCE(input_tokens, 0) * p.input
+                        + COALESCE(cache_creation_tokens, 0) * p.cache_write
+                        + COALESCE(cache_read_tokens, 0) * p.cache_read
+                        + COALESCE(output_tokens, 0) * p.output, 4)"""
+        match = "p.model IS turns.model AND p.date IS turns.date"
+        with db:
+            db.execute("""CREATE TEMP TABLE IF NOT EXISTS prices (
+                model TEXT, date TEXT, input REAL, cache_write REAL,
+                cache_read REAL, output REAL)""")
+            db.execute("DELETE FROM prices")
+            db.executemany("INSERT INTO prices VALUES (?, ?, ?, ?, ?, ?)",
+                           [(m, d) + tuple(rates(m, d)) for m, d in pairs])
+            count, old_total = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(estimated_cost_usd), 0) FROM turns").fetchone()
+            new_total, changed = db.execute(f"""
+                SELECT COALESCE(SUM(CASE WHEN {has_tokens} THEN {cost}
+                                         ELSE COALESCE(estimated_cost_usd, 0) END), 0),
+                       COALESCE(SUM({has_tokens}
+                                    AND ABS({cost} - COALESCE(estimated_cost_usd, 0)) > 1e-9), 0)
+                FROM turns JOIN prices AS p ON {match}""").fetchone()
+            if changed and not dry_run:
+                db.execute(f"""
+                    UPDATE turns SET estimated_cost_usd =
+                        (SELECT {cost} FROM prices AS p WHERE {match})
+                    WHERE {has_tokens}""")
+                self._rebuild_rollups()
+            db.execute("DROP TABLE prices")
+        if changed and not dry_run:
+            update_today(self)
+        return count, changed, old_total, new_total
+
+    @_locked
+    def compact(self):
+        """Fold any leftover tokens.json / segments in, then VACUUM."""
+        n = self.db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        leftovers = TokenStore(self.tracking_dir)
+        entries = leftovers.load()
+        if entries:
+            self.append(entries)
+            leftovers.clear()
+        self.db.execute("VACUUM")
+        return n + len(entries), self.db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    @_locked
+    def clear(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+
+def open_store(tracking_dir):
+    """The SQLite store if tokens.db exists, else the segment store."""
+    if os.path.exists(os.path.join(tracking_dir, SQLITE_FILE)):
+        return SqliteTokenStore(tracking_dir)
+    return TokenStore(tracking_dir)
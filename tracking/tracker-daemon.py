@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Resident tracker: tails a project's transcripts and keeps the token store,
+charts and prompt index current without a cold Python start per hook.
+
+Usage:
+  python3 tracker-daemon.py <project_root> [--poll SECONDS] [--idle-exit SECONDS]
+  python3 tracker-daemon.py <project_root> --ping [transcript.jsonl]
+  python3 tracker-daemon.py <project_root> --summary
+  python3 tracker-daemon.py <project_root> --stop
+
+The daemon watches ~/.claude/projects/<slug>/ with inotify where available
+and falls back to polling (every --poll seconds, default 2; with inotify the
+poll is only a slow safety net). Appended turns are ingested with backfill's
+cursors, which stay in memory along with the open store, so each change
+costs the new bytes only. Charts and key-prompts.md are regenerated in
+process, debounced, after turns land.
+
+Hooks talk to it over a Unix socket in $TMPDIR (one per project): --ping
+asks it to ingest a transcript now (and exits 1 if no daemon is running, so
+the caller can fall back to the batch scripts), --summary prints the warm
+store summary as JSON. The daemon exits after --idle-exit seconds (default
+1800) without transcript activity or requests.
+"""
+import sys, os, json, socket, hashlib, tempfile, fcntl
+from contextlib import contextmanager
+
+DEBOUNCE = 1.0
+
+
+def socket_path(project_root):
+    digest = hashlib.sha1(project_root.encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"claude-tracker-{os.getuid()}-{digest}.sock")
+
+
+def request(project_root, msg, timeout=10):
+    """Send one request to the project's daemon; None if none is running."""
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(socket_path(project_root))
+        s.sendall(json.dumps(msg).encode() + b"\n")
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+        return json.loads(buf) if buf else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        s.close()
+
+
+class Inotify:
+    """Minimal inotify watch on one directory via libc; Linux only."""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, path):
+        import ctypes, ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, path.encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def read_names(self):
+        import struct
+        names = set()
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        i = 0
+        while i + 16 <= len(buf):
+            _, _, _, length = struct.unpack_from("iIII", buf, i)
+            name = buf[i + 16:i + 16 + length].rstrip(b"\0").decode(errors="replace")
+            if name:
+                names.add(name)
+            i += 16 + length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Tracker:
+    def __init__(self, project_root):
+        from token_store import open_store
+        from backfill import load_cursors
+
+        self.project_root = project_root
+        self.project_name = os.path.basename(project_root)
+        self.tracking_dir = os.path.join(project_root, ".claude", "tracking")
+        self.tokens_file = os.path.join(self.tracking_dir, "tokens.json")
+        self.cursors_file = os.path.join(self.tracking_dir, "backfill-cursors.json")
+        self.transcripts_dir = os.path.expanduser(
+            "~/.claude/projects/" + project_root.replace("/", "-"))
+        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.store = open_store(self.tracking_dir)
+        self.cursors = load_cursors(self.cursors_file, self.store)
+        self.cursors_mtime = self._cursors_mtime()
+        self.seen = {}          # transcript path -> (size, mtime_ns), for polling
+        self.summary = None     # warm store summary, dropped when turns land
+        self.charts_due = False
+
+    def _reopen_store(self):
+        """Follow a compact-tokens.py --to migration: reopen the store if its
+        backend changed, so turns land in (and are read from) the new one."""
+        from token_store import open_store
+        from backfill import load_cursors
+
+        store = open_store(self.tracking_dir)
+        if type(store) is not type(self.store):
+            self.store = store
+            self.cursors = load_cursors(self.cursors_file, store)
+            self.cursors_mtime = self._cursors_mtime()
+            self.summary = None
+
+    def _cursors_mtime(self):
+        try:
+            return os.stat(self.cursors_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self):
+        """Transcripts, plain or archived, whose size or mtime changed since
+        the last poll. Cursors of transcripts that are gone are forgotten."""
+        from transcripts import list_transcripts, session_id_of
+        from backfill import save_cursors
+
+        changed = set()
+        current = {}
+        for jf in list_transcripts(self.transcripts_dir):
+            try:
+                st = os.stat(jf)
+            except OSError:
+                continue
+            current[jf] = (st.st_size, st.st_mtime_ns)
+            if self.seen.get(jf) != current[jf]:
+                changed.add(jf)
+        self.seen = current
+
+        if os.path.isdir(self.transcripts_dir):
+            sessions = {session_id_of(jf) for jf in current}
+            forget = [sid for sid in self.cursors if sid not in sessions]
+            if forget:
+                for sid in forget:
+                    del self.cursors[sid]
+                save_cursors(self.cursors_file, self.store, self.cursors, forget)
+                self.cursors_mtime = self._cursors_mtime()
+        return changed
+
+    def ingest(self, jsonl_files):
+        """Write new turns from the given transcripts; returns turns written."""
+        from backfill import backfill, load_cursors, save_cursors
+
+        if not jsonl_files:
+            return 0
+        self._reopen_store()
+        # A batch backfill may have run alongside; pick up its cursors
+        if self._cursors_mtime() != self.cursors_mtime:
+            self.cursors = load_cursors(self.cursors_file, self.store)
+        _, new_entries, cursors_changed = backfill(
+            self.store, self.project_name, sorted(jsonl_files), self.cursors)
+        if cursors_changed:
+            save_cursors(self.cursors_file, self.store, self.cursors)
+            self.cursors_mtime = self._cursors_mtime()
+        if new_entries:
+            self.summary = None
+            self.charts_due = True
+        return len(new_entries)
+
+    def get_summary(self):
+        self._reopen_store()
+        if self.summary is None:
+            self.summary = self.store.summary()
+        return self.summary
+
+    def regenerate(self):
+        """Charts and prompt index, run in this interpreter."""
+        import runpy
+        self.charts_due = False
+        for script, argv in (
+                ("generate-charts.py", [self.tokens_file, os.path.join(self.tracking_dir, "charts.html")]),
+                ("update-prompts-index.py", [self.tracking_dir])):
+            saved = sys.argv
+            sys.argv = [script] + argv
+            try:
+                runpy.run_path(os.path.join(self.script_dir, script), run_name="__main__")
+            except SystemExit:
+                pass
+            except Exception:
+                pass
+            finally:
+                sys.argv = saved
+
+    def handle(self, msg):
+        cmd = msg.get("cmd")
+        if cmd == "ping":
+            jf = msg.get("transcript")
+            files = {os.path.abspath(jf)} if jf else self.poll()
+            return {"ok": True, "turns": self.ingest(files)}
+        if cmd == "summary":
+            return {"ok": True, "summary": self.get_summary()}
+        if cmd == "stop":
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command {cmd!r}"}
+
+
+@contextmanager
+def path_lock(path):
+    """flock on path + ".lock": starters and exiting daemons take it around
+    every check, removal and bind of the socket path, so none of them
+    removes a socket another has just bound."""
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def bind(path):
+    """Listening socket at path, or None if another daemon already owns it."""
+    with path_lock(path):
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                return None
+            except OSError:
+                os.remove(path)     # stale socket from a daemon that died
+            finally:
+                probe.close()
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.bind(path)
+        except OSError:
+            s.close()
+            return None
+        os.chmod(path, 0o600)
+        s.listen(16)
+    s.setblocking(False)
+    return s
+
+
+def unbind(server, path, inode):
+    """Close the listening socket and remove path, unless it is no longer
+    the socket this daemon bound (inode)."""
+    with path_lock(path):
+        server.close()
+        try:
+            if os.stat(path).st_ino == inode:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def serve(project_root, poll_interval, idle_exit):
+    import selectors, time
+    from transcripts import TRANSCRIPT_SUFFIXES
+
+    path = socket_path(project_root)
+    server = bind(path)
+    if server is None:
+        return 0
+    inode = os.stat(path).st_ino
+
+    tracker = Tracker(project_root)
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ, "accept")
+
+    watch = None
+    try:
+        watch = Inotify(tracker.transcripts_dir)
+        sel.register(watch.fd, selectors.EVENT_READ, "inotify")
+        poll_interval = max(poll_interval, 60)
+    except (OSError, AttributeError):
+        pass
+
+    # Catch up on anything written while no daemon was running
+    tracker.ingest(tracker.poll())
+    pending = set()
+    last_activity = last_change = last_poll = time.monotonic()
+    running = True
+    try:
+        while running:
+            now = time.monotonic()
+            deadlines = [last_poll + poll_interval, last_activity + idle_exit]
+            if pending or tracker.charts_due:
+                deadlines.append(last_change + DEBOUNCE)
+            for key, _ in sel.select(max(0, min(deadlines) - now)):
+                if key.data == "inotify":
+                    names = watch.read_names()
+                    pending.update(os.path.join(tracker.transcripts_dir, n)
+                                   for n in names if n.endswith(TRANSCRIPT_SUFFIXES))
+                    last_change = last_activity = time.monotonic()
+                    continue
+                try:
+                    conn, _ = server.accept()
+                except BlockingIOError:
+                    continue
+                with conn:
+                    conn.settimeout(5)
+                    try:
+                        buf = b""
+                        while not buf.endswith(b"\n"):
+                            chunk = conn.recv(65536)
+                            if not chunk:
+                                break
+                            buf += chunk
+                        msg = json.loads(buf or b"{}")
+                        reply = tracker.handle(msg)
+                        conn.sendall(json.dumps(reply).encode() + b"\n")
+                        running = msg.get("cmd") != "stop"
+                    except Exception:
+                        pass
+                last_change = last_activity = time.monotonic()
+
+            now = time.monotonic()
+            if now - last_poll >= poll_interval:
+                changed = tracker.poll()
+                if changed:
+                    pending.update(changed)
+                    last_change = last_activity = now
+                last_poll = now
+            if (pending or tracker.charts_due) and now - last_change >= DEBOUNCE:
+                tracker.ingest(pending)
+                pending = set()
+                if tracker.charts_due:
+                    tracker.regenerate()
+            if now - last_activity >= idle_exit:
+                break
+    finally:
+        sel.close()
+        unbind(server, path, inode)
+        if watch is not None:
+            watch.close()
+    return 0
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        sys.exit(__doc__.strip())
+    project_root = os.path.abspath(args[0])
+    rest = args[1:]
+
+    if "--ping" in rest:
+        i = rest.index("--ping")
+        transcript = rest[i + 1] if i + 1 < len(rest) else None
+        reply = request(project_root, {"cmd": "ping", "transcript": transcript})
+        sys.exit(0 if reply and reply.get("ok") else 1)
+    if "--summary" in rest:
+        reply = request(project_root, {"cmd": "summary"})
+        if not reply:
+            sys.exit(1)
+        print(json.dumps(reply["summary"], indent=2))
+        sys.exit(0)
+    if "--stop" in rest:
+        sys.exit(0 if request(project_root, {"cmd": "stop"}) else 1)
+
+    poll_interval = 2.0
+    idle_exit = 1800.0
+    if "--poll" in rest:
+        poll_interval = float(rest[rest.index("--poll") + 1])
+    if "--idle-exit" in rest:
+        idle_exit = float(rest[rest.index("--idle-exit") + 1])
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(serve(project_root, poll_interval, idle_exit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Transcript parsing shared by the tracking scripts.
+
+parse_turns() reads a Claude Code JSONL transcript (optionally from a byte
+offset) into user/assistant timestamps and usage blocks; compute_turns()
+pairs them into per-turn token entries. parse_session() wraps both for one
+transcript and is what backfill.py fans out across worker processes, so it
+takes and returns only plain picklable values. count_human_messages() counts
+the human prompts generate-charts.py reports per day.
+
+Most transcript bytes are tool results and file contents that none of the
+parsers need, so transcripts are memory-mapped, lines are checked for cheap
+byte markers in place and only copied out and decoded when they can matter
+(see LineScanner). Decoding uses orjson when it is installed and the stdlib
+json module otherwise.
+
+Transcripts archived by archive-transcripts.py are <session>.jsonl.gz (or
+.jsonl.zst when the zstandard module is installed) and are decompressed as
+a stream while scanning. Each has a <session>.summary.json sidecar with its
+turn count, usage totals, date range and human prompt counts, which callers
+use instead of decompressing when that is all they need.
+"""
+import gzip
+import io
+import json
+import mmap
+import os
+from datetime import datetime
+
+from pricing import turn_cost
+from token_store import COLUMNS
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Scan counters for profiling.py, summed over every parse in this process
+STATS = {"bytes_read": 0, "lines": 0, "lines_decoded": 0}
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# Byte markers checked before decoding. Inside JSON string values quotes are
+# escaped, so an unescaped marker can only come from an actual key/value.
+_USER = (b'"type":"user"', b'"type": "user"')
+_ASSISTANT = (b'"type":"assistant"', b'"type": "assistant"')
+_ASSISTANT_ROLE = (b'"role":"assistant"', b'"role": "assistant"')
+_TOOL_RESULT = (b'"type":"tool_result"', b'"type": "tool_result"')
+_TEXT = (b'"type":"text"', b'"type": "text"')
+_TIMESTAMP = b'"timestamp":"'
+# Top-level fields as Claude Code writes them (compact), for the user-line
+# shortcut in parse_turns()
+_TOP_USER = b'"type":"user"'
+_TOP_MAIN = b'"isSidechain":false'
+_TOP_SIDECHAIN = b'"isSidechain":true'
+
+
+TRANSCRIPT_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+SIDECAR_SUFFIX = ".summary.json"
+
+
+def _has(buf, start, end, markers):
+    return buf.find(markers[0], start, end) >= 0 or buf.find(markers[1], start, end) >= 0
+
+
+def session_id_of(jf):
+    name = os.path.basename(jf)
+    for suffix in TRANSCRIPT_SUFFIXES[::-1]:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def is_archived(jf):
+    return jf.endswith(TRANSCRIPT_SUFFIXES[1:])
+
+
+def list_transcripts(transcripts_dir):
+    """Sorted transcript paths, plain and archived; a session with both
+    (archiving interrupted before the original was removed) is listed by
+    its plain file."""
+    try:
+        names = os.listdir(transcripts_dir)
+    except OSError:
+        return []
+    found = {}
+    for name in names:
+        if not name.endswith(TRANSCRIPT_SUFFIXES):
+            continue
+        if name.endswith(".jsonl.zst") and zstandard is None:
+            continue
+        sid = session_id_of(name)
+        if sid not in found or name.endswith(".jsonl"):
+            found[sid] = os.path.join(transcripts_dir, name)
+    return sorted(found.values())
+
+
+def find_transcript(transcripts_dir, session_id):
+    """Path of a session's transcript, plain or archived, or None."""
+    for suffix in TRANSCRIPT_SUFFIXES:
+        jf = os.path.join(transcripts_dir, session_id + suffix)
+        if os.path.exists(jf):
+            return jf
+    return None
+
+
+def open_transcript(jf):
+    """Binary file object over the transcript's JSONL, decompressing
+    archived ones as they are read."""
+    if jf.endswith(".gz"):
+        return gzip.open(jf, "rb")
+    if jf.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"zstandard is not installed, can't read {jf}")
+        fh = open(jf, "rb")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(fh, closefd=True))
+    return open(jf, "rb")
+
+
+def sidecar_path(jf):
+    return os.path.join(os.path.dirname(jf), session_id_of(jf) + SIDECAR_SUFFIX)
+
+
+def read_sidecar(jf):
+    """The archive summary written next to an archived transcript, or None."""
+    if not is_archived(jf):
+        return None
+    try:
+        with open(sidecar_path(jf)) as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+class LineScanner:
+    """Complete lines of a JSONL transcript from a byte offset, as
+    (buf, start, end) spans.
+
+    Plain transcripts are memory-mapped and buf is the mapping itself:
+    lines are found with find(b"\n") and tested with bounded find() calls,
+    so a line is only copied out (buf[start:end]) when it is decoded, and
+    pages already scanned are released as the scan moves on. Archived
+    transcripts are streamed through the decompressor; buf is then the line.
+
+    .offset is the end of the last complete line yielded, so a line that is
+    still being written is left for the next scan. For archived transcripts
+    offsets count decompressed bytes.
+    """
+
+    RELEASE = 2 << 20       # drop scanned pages every this many bytes
+
+    def __init__(self, jf, offset=0):
+        self.jf = jf
+        self.offset = offset
+
+    def __iter__(self):
+        if is_archived(self.jf):
+            yield from self._stream()
+            return
+        with open(self.jf, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= self.offset:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                release = hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+                released = self.offset - self.offset % mmap.PAGESIZE
+                find = mm.find
+                pos = self.offset
+                while True:
+                    end = find(b"\n", pos)
+                    if end < 0:
+                        break
+                    yield mm, pos, end + 1
+                    pos = self.offset = end + 1
+                    if release and pos - released >= self.RELEASE:
+                        upto = pos - pos % mmap.PAGESIZE
+                        mm.madvise(mmap.MADV_DONTNEED, released, upto - released)
+                        released = upto
+
+    def _stream(self):
+        with open_transcript(self.jf) as f:
+            if self.offset:
+                f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                yield line, 0, len(line)
+
+
+def parse_turns(jf, offset=0):
+    """Parse a JSONL transcript from byte offset into messages and usages.
+
+    Only complete lines are consumed, so the returned end offset never points
+    into a line that is still being written. Returns None if the file can't
+    be read.
+    """
+    msgs = []       # (role, timestamp)
+    usages = []     # usage dicts from assistant messages, in order
+    model = "unknown"
+    first_ts = None
+    scanner = LineScanner(jf, offset)
+    lines = decoded = 0
+
+    try:
+        for buf, start, end in scanner:
+            lines += 1
+            is_user = _has(buf, start, end, _USER)
+            is_assistant = (_has(buf, start, end, _ASSISTANT)
+                            or _has(buf, start, end, _ASSISTANT_ROLE))
+            if first_ts is not None:
+                if not is_user and not is_assistant:
+                    continue
+                # User lines (mostly multi-KB tool results) only contribute a
+                # timestamp; take it straight from the bytes when unambiguous.
+                # Up to the first nested object the line holds only top-level
+                # scalar fields, so type and isSidechain are checked there;
+                # any other shape (progress lines embed whole user messages,
+                # other spellings, other key orders) is decoded.
+                if is_user and not is_assistant:
+                    head = buf.find(b"{", start + 1, end)
+                    if head < 0:
+                        head = end
+                    if buf.find(_TOP_USER, start, head) >= 0:
+                        if buf.find(_TOP_SIDECHAIN, start, head) >= 0:
+                            continue
+                        t = buf.find(_TIMESTAMP, start, end)
+                        if (t >= 0 and buf.find(_TIMESTAMP, t + 1, end) < 0
+                                and buf.find(_TOP_MAIN, start, head) >= 0):
+                            t += len(_TIMESTAMP)
+                            ts = buf[t:buf.find(b'"', t, end)].decode()
+                            if ts:
+                                msgs.append(("user", ts))
+                            continue
+            decoded += 1
+            try:
+                obj = loads(buf[start:end])
+                ts = obj.get("timestamp")
+                if ts and first_ts is None:
+                    first_ts = ts
+                t = obj.get("type")
+                if t == "user" and not obj.get("isSidechain") and ts:
+                    msgs.append(("user", ts))
+                elif t == "assistant" and ts:
+                    msgs.append(("assistant", ts))
+                msg = obj.get("message", {})
+                if isinstance(msg, dict) and msg.get("role") == "assistant":
+                    usage = msg.get("usage", {})
+                    if usage:
+                        usages.append(usage)
+                    m = msg.get("model", "")
+                    if m:
+                        model = m
+            except Exception:
+                pass
+    except Exception:
+        return None
+    finally:
+        STATS["bytes_read"] += scanner.offset - offset
+        STATS["lines"] += lines
+        STATS["lines_decoded"] += decoded
+
+    return msgs, first_ts, model, usages, scanner.offset
+
+def compute_turns(msgs, usages, first_ts, model, session_id, project_name, turn_index=0):
+    """Convert message list + usages into per-turn entry dicts.
+
+    Returns (entries, resume). resume holds the next turn index, the trailing
+    user messages still waiting for an answer and the usage blocks not yet
+    consumed, so parsing can continue later from the transcript's end offset.
+    """
+    entries = []
+    usage_index = 0
+    pending_at = None
+    i = 0
+
+    # Date from first timestamp
+    session_date = None
+    if first_ts:
+        try:
+            session_date = datetime.fromisoformat(
+                first_ts.replace("Z", "+00:00")
+            ).strftime("%Y-%m-%d")
+        except Exception:
+            pass
+
+    while i < len(msgs):
+        if msgs[i][0] == "user":
+            user_ts = msgs[i][1]
+            j = i + 1
+            while j < len(msgs) and msgs[j][0] != "assistant":
+                j += 1
+            if j < len(msgs):
+                asst_ts = msgs[j][1]
+                # Consume next usage block for this turn
+                usage = {}
+                if usage_index < len(usages):
+                    usage = usages[usage_index]
+                    usage_index += 1
+
+                inp = usage.get("input_tokens", 0)
+                out = usage.get("output_tokens", 0)
+                cache_create = usage.get("cache_creation_input_tokens", 0)
+                cache_read = usage.get("cache_read_input_tokens", 0)
+                total = inp + cache_create + cache_read + out
+
+                if total == 0:
+                    # Skip turns with no token data
+                    i = j + 1
+                    turn_index += 1
+                    continue
+
+                duration = 0
+                try:
+                    t0 = datetime.fromisoformat(user_ts.replace("Z", "+00:00"))
+                    t1 = datetime.fromisoformat(asst_ts.replace("Z", "+00:00"))
+                    duration = max(0, int((t1 - t0).total_seconds()))
+                except Exception:
+                    pass
+
+                # Turn timestamp = user message timestamp
+                turn_ts = user_ts
+                # Normalize to Z format
+                try:
+                    turn_ts = datetime.fromisoformat(user_ts.replace("Z", "+00:00")).strftime("%Y-%m-%dT%H:%M:%SZ")
+                except Exception:
+                    pass
+
+                # Use date from this turn's timestamp if possible
+                turn_date = session_date
+                try:
+                    turn_date = datetime.fromisoformat(user_ts.replace("Z", "+00:00")).strftime("%Y-%m-%d")
+                except Exception:
+                    pass
+
+                cost = turn_cost(model, turn_date or session_date,
+                                 inp, cache_create, cache_read, out)
+
+                entries.append({
+                    "date": turn_date or session_date,
+                    "project": project_name,
+                    "session_id": session_id,
+                    "turn_index": turn_index,
+                    "turn_timestamp": turn_ts,
+                    "input_tokens": inp,
+                    "cache_creation_tokens": cache_create,
+                    "cache_read_tokens": cache_read,
+                    "output_tokens": out,
+                    "total_tokens": total,
+                    "estimated_cost_usd": cost,
+                    "model": model,
+                    "duration_seconds": duration,
+                })
+                turn_index += 1
+                i = j + 1
+            else:
+                if pending_at is None:
+                    pending_at = i
+                i += 1
+        else:
+            i += 1
+
+    resume = {
+        "turn_index": turn_index,
+        "pending": [ts for _, ts in msgs[pending_at:]] if pending_at is not None else [],
+        "usages": [{k: u.get(k, 0) for k in USAGE_KEYS} for u in usages[usage_index:]],
+        "first_ts": first_ts,
+        "model": model,
+    }
+    return entries, resume
+
+
+def parse_session(jf, session_id, project_name, offset=0, state=None):
+    """Parse one transcript, continuing from (offset, state) if given.
+
+    Returns (rows, resume, end_offset) where rows are entry tuples in
+    token_store.COLUMNS order (compact to ship back from a worker), or None
+    if the file can't be read.
+    """
+    result = parse_turns(jf, offset)
+    if result is None:
+        return None
+    msgs, first_ts, model, usages, end_offset = result
+
+    turn_index = 0
+    if state:
+        msgs = [("user", ts) for ts in state["pending"]] + msgs
+        usages = state["usages"] + usages
+        first_ts = state["first_ts"] or first_ts
+        if model == "unknown":
+            model = state["model"]
+        turn_index = state["turn_index"]
+
+    entries, resume = compute_turns(msgs, usages, first_ts, model, session_id, project_name, turn_index)
+    return [tuple(e[k] for k in COLUMNS) for e in entries], resume, end_offset
+
+
+def row_to_entry(row):
+    return dict(zip(COLUMNS, row))
+
+
+def _is_trivial(text):
+    return len(text) < 40 and "?" not in text
+
+
+def count_human_messages(jf, offset=0):
+    """Count human prompts (and trivial ones) in a transcript from byte offset.
+
+    Returns (human, trivial, end_offset); like parse_turns only complete
+    lines are consumed, so counts from successive offsets can be summed.
+    """
+    human = 0
+    trivial = 0
+    scanner = LineScanner(jf, offset)
+    lines = decoded = 0
+    try:
+        for buf, start, end in scanner:
+            lines += 1
+            if not _has(buf, start, end, _USER):
+                continue
+            # Tool-result-only messages are never counted
+            if _has(buf, start, end, _TOOL_RESULT) and not _has(buf, start, end, _TEXT):
+                continue
+            decoded += 1
+            try:
+                obj = loads(buf[start:end])
+                # Human messages have type="user" and userType="human" at the top level
+                if obj.get("type") != "user":
+                    continue
+                if obj.get("userType") not in ("human", "external", None):
+                    continue
+                if obj.get("isSidechain"):
+                    continue
+                content = obj.get("message", {}).get("content", "")
+                if isinstance(content, list):
+                    # Skip pure tool-result messages
+                    texts = [
+                        c.get("text", "") for c in content
+                        if isinstance(c, dict) and c.get("type") == "text"
+                        and not str(c.get("text", "")).strip().startswith("<")
+                    ]
+                    if texts:
+                        text = " ".join(texts).strip()
+                        human += 1
+                        if _is_trivial(text):
+                            trivial += 1
+                elif isinstance(content, str):
+                    text = content.strip()
+                    # Skip slash commands and empty
+                    if text and not text.startswith("<") and not text.startswith("/"):
+                        human += 1
+                        if _is_trivial(text):
+                            trivial += 1
+            except Exception:
+                pass
+    except Exception:
+        pass
+    STATS["bytes_read"] += scanner.offset - offset
+    STATS["lines"] += lines
+    STATS["lines_decoded"] += decoded
+    return human, trivial, scanner.offset
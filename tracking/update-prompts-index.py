@@ -3,46 +3,43 @@
 Regenerates <tracking_dir>/key-prompts.md index from files in key-prompts/ folder.
 Called by stop-hook.sh after each session.
 
-Usage: python3 update-prompts-index.py <tracking_dir>
+Day files are read through key_prompts.py's cache, so only the ones written
+since the last run are parsed, and key-prompts.md is only rewritten when its
+content changes.
+
+Usage: python3 update-prompts-index.py <tracking_dir> [--profile]
 """
 import sys
 import os
-import re
-import glob
 
+import profiling
+from key_prompts import load
+
+profiling.start("update-prompts-index")
 tracking_dir = sys.argv[1]
+profiling.set_tracking_dir(tracking_dir)
 prompts_dir = os.path.join(tracking_dir, "key-prompts")
 index_file = os.path.join(tracking_dir, "key-prompts.md")
 
 if not os.path.isdir(prompts_dir):
     sys.exit(0)
 
-files = sorted(glob.glob(os.path.join(prompts_dir, "????-??-??.md")))
-if not files:
+profiling.mark("read")
+days = load(tracking_dir)
+if not days:
     sys.exit(0)
 
 rows = []
 total_entries = 0
 
-for f in files:
-    date = os.path.splitext(os.path.basename(f))[0]
-    with open(f) as fh:
-        content = fh.read()
-
-    # Count entries (## headings that are not the title line)
-    entries = len(re.findall(r'^## (?!Key Prompts)', content, re.MULTILINE))
-
-    # Extract first 3 entry titles for highlights
-    titles = re.findall(r'^## (.+)', content, re.MULTILINE)
-    # Skip the file title (first line if it matches "Key Prompts — ...")
-    titles = [t for t in titles if not t.startswith("Key Prompts")]
-    highlights = ", ".join(titles[:3])
-    if len(titles) > 3:
+for date, meta in sorted(days.items()):
+    highlights = ", ".join(meta["titles"])
+    if meta["more"]:
         highlights += "..."
+    rows.append((date, meta["entries"], highlights))
+    total_entries += meta["entries"]
 
-    rows.append((date, entries, highlights))
-    total_entries += entries
-
+profiling.mark("write")
 lines = ["# Prompt Journal\n",
          "\nHigh-signal prompts organized by day.\n",
          "\n| File | Entries | Highlights |\n",
@@ -56,5 +53,13 @@ lines.append("\n---\n")
 lines.append("\nNew entries go in `key-prompts/YYYY-MM-DD.md` for today's date. "
              "Create the file if it doesn't exist — use the same header format as existing files.\n")
 
-with open(index_file, "w") as f:
-    f.writelines(lines)
+# Leave the index (and its mtime) alone when nothing in it changed
+text = "".join(lines)
+try:
+    with open(index_file) as f:
+        unchanged = f.read() == text
+except OSError:
+    unchanged = False
+if not unchanged:
+    with open(index_file, "w") as f:
+        f.write(text)